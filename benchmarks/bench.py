@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: # Run as a script, including blender --python
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from benchmarks.synthetic import write_archive, write_folder
+from sanzarumodelimport.core import (
+    ASSET_INDEX_NAME,
+    AssetIndex,
+    SanzaruArchive,
+    SanzaruGEOB,
+    SanzaruSubmesh,
+    find_file,
+    read_root_chunk,
+)
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+RESULTS_VERSION = 1
+
+def measure(function, repeat, setup=None): # Best of repeat runs, setup is not timed
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start_time = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+class Benchmark:
+    def __init__(self, folder, repeat):
+        self.folder = folder
+        self.repeat = repeat
+        self.stages = {}
+        self.geo_data = []
+        self.models = [] # (geo, [(submesh, smsh chunk)])
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".geo"):
+                with open(os.path.join(folder, name), "rb") as file:
+                    self.geo_data.append(file.read())
+
+    def record(self, stage, seconds, items):
+        self.stages[stage] = {"seconds": seconds, "items": items}
+        print(f"{stage:<20} {seconds * 1000:10.3f} ms  {items:>8} items")
+
+    def submeshes(self):
+        return [(submesh, smsh) for geo, parts in self.models for submesh, smsh in parts]
+
+    def run_lookup(self):
+        index_path = os.path.join(self.folder, ASSET_INDEX_NAME)
+
+        def cold_setup():
+            AssetIndex._loaded.clear()
+            if os.path.exists(index_path):
+                os.remove(index_path)
+
+        self.record("index_cold", measure(lambda: AssetIndex.get(self.folder), self.repeat, cold_setup), 1)
+        self.record("index_warm", measure(lambda: AssetIndex.get(self.folder), self.repeat, AssetIndex._loaded.clear), 1)
+
+        index = AssetIndex.get(self.folder)
+        lookups = [(suffix, file_hash) for suffix, hashes in index.hashes.items() for file_hash in hashes]
+
+        def lookup():
+            for suffix, file_hash in lookups:
+                find_file(self.folder, suffix, file_hash)
+
+        self.record("hash_lookup", measure(lookup, self.repeat), len(lookups))
+
+    def run_archive(self, archive_path):
+        def lookup():
+            archive = SanzaruArchive(archive_path)
+            for suffix, entries in archive.hashes.items():
+                for file_hash in entries:
+                    archive.open(suffix, file_hash)
+            archive.close()
+
+        self.record("archive_lookup", measure(lookup, self.repeat), 1)
+
+    def run_parse(self):
+        index = AssetIndex.get(self.folder)
+        geos = [SanzaruGEOB(data) for data in self.geo_data]
+        meshes = [read_root_chunk(index.open(".mes", geo.hash), b"MESH") for geo in geos]
+        self.models = []
+        for geo, mesh in zip(geos, meshes):
+            self.models.append((geo, [(SanzaruSubmesh(smsh, geo), smsh) for smsh in mesh.find_all(b"SMSH")]))
+        submeshes = self.submeshes()
+
+        def headers():
+            for data in self.geo_data:
+                SanzaruGEOB(data)
+            for mesh in meshes:
+                read_root_chunk(mesh.view, b"MESH")
+            for submesh, smsh in submeshes:
+                submesh.read_header(smsh.child(b"MHDR"))
+
+        def vertices():
+            for submesh, smsh in submeshes:
+                submesh.decode_vertices(smsh)
+
+        def indices():
+            for submesh, smsh in submeshes:
+                submesh.decode_faces(smsh)
+
+        def full():
+            for geo, parts in self.models:
+                for submesh, smsh in parts:
+                    SanzaruSubmesh(smsh, geo)
+
+        def batches():
+            for submesh, smsh in submeshes:
+                if submesh.get_weights:
+                    for batch in submesh.weight_batches():
+                        pass
+
+        vertex_count = sum(submesh.vertex.count for submesh, smsh in submeshes)
+        face_count = sum(submesh.face.count for submesh, smsh in submeshes)
+        self.record("header_parse", measure(headers, self.repeat), len(submeshes))
+        self.record("vertex_decode", measure(vertices, self.repeat), vertex_count)
+        self.record("index_decode", measure(indices, self.repeat), face_count)
+        self.record("submesh_parse", measure(full, self.repeat), len(submeshes))
+        self.record("weight_batches", measure(batches, self.repeat), vertex_count)
+
+    def run_blender(self):
+        from sanzarumodelimport.importer import bind_weights, make_mesh, make_skel
+
+        collection = bpy.data.collections.new("SanzaruBenchmark")
+        bpy.context.scene.collection.children.link(collection)
+        objects = []
+
+        def clear():
+            for obj in objects:
+                mesh = obj.data
+                bpy.data.objects.remove(obj)
+                bpy.data.meshes.remove(mesh)
+            objects.clear()
+
+        def build():
+            for geo, parts in self.models:
+                for i, (submesh, smsh) in enumerate(parts):
+                    objects.append(make_mesh(submesh, geo, i, collection, None))
+
+        self.record("mesh_build", measure(build, self.repeat, clear), len(self.submeshes()))
+
+        # Weight binding on the meshes left by the last build
+        skinned = []
+        obj_i = 0
+        for geo, parts in self.models:
+            skel_obj = make_skel(geo, collection) if geo.bone_count else None
+            for submesh, smsh in parts:
+                if skel_obj:
+                    skinned.append((objects[obj_i], submesh, skel_obj.pose.bones))
+                obj_i += 1
+
+        def clear_groups():
+            for obj, submesh, bones in skinned:
+                obj.vertex_groups.clear()
+
+        def bind():
+            for obj, submesh, bones in skinned:
+                bind_weights(obj, submesh, bones)
+
+        vertex_count = sum(submesh.vertex.count for obj, submesh, bones in skinned)
+        self.record("weight_binding", measure(bind, self.repeat, clear_groups), vertex_count)
+
+def compare(results, baseline, tolerance, min_delta): # Stages slower than the baseline beyond tolerance
+    regressions = []
+    for stage, result in results["stages"].items():
+        previous = baseline["stages"].get(stage)
+        if previous is None:
+            continue
+        seconds, base_seconds = result["seconds"], previous["seconds"]
+        ratio = seconds / base_seconds if base_seconds else float("inf")
+        status = ""
+        if seconds > base_seconds * (1 + tolerance) and seconds - base_seconds > min_delta:
+            status = "REGRESSION"
+            regressions.append(stage)
+        print(f"{stage:<20} {base_seconds * 1000:10.3f} -> {seconds * 1000:10.3f} ms  x{ratio:5.2f}  {status}")
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Time Sanzaru parsing and import stages on synthetic assets")
+    parser.add_argument("--models", type=int, default=8, help="number of .geo/.mes pairs")
+    parser.add_argument("--vertices", type=int, default=2000, help="vertices per submesh (max 65535)")
+    parser.add_argument("--bones", type=int, default=32, help="bones per model, 0 for static meshes")
+    parser.add_argument("--submeshes", type=int, default=4, help="submeshes per model")
+    parser.add_argument("--mhdr-version", type=int, default=1, choices=range(6), help="MHDR version written to submeshes")
+    parser.add_argument("--packed", action="store_true", help="write packed vertex/index streams instead of MVTX/MIDX (MHDR v4+)")
+    parser.add_argument("--lods", type=int, default=1, help="GLOD detail levels per model, only the first is timed")
+    parser.add_argument("--textures", type=int, default=4, help="shared materials/textures")
+    parser.add_argument("--texture-size", type=int, default=128)
+    parser.add_argument("--extra-files", type=int, default=0, help="unreferenced .mes files to pad the folder with")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage, the best is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="folder for the generated assets, kept afterwards (default: temporary)")
+    parser.add_argument("-o", "--output", help="write results as JSON, usable as a later --baseline")
+    parser.add_argument("--baseline", help="results JSON to compare against, exits with 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a stage counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.001, help="ignore slowdowns smaller than this many seconds")
+    if "--" in argv: # blender -b --python bench.py -- <options>
+        argv = argv[argv.index("--") + 1:]
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if not 3 <= args.vertices <= 0xFFFF:
+        raise SystemExit("--vertices must be between 3 and 65535")
+    if args.packed and args.mhdr_version < 4:
+        raise SystemExit("--packed needs --mhdr-version 4 or 5")
+
+    config = {key: value for key, value in vars(args).items() if key not in ("workdir", "output", "baseline", "tolerance", "min_delta")}
+    workdir = args.workdir or tempfile.mkdtemp(prefix="sanzaru_bench_")
+    folder = os.path.join(workdir, "level")
+    if os.path.isdir(folder):
+        shutil.rmtree(folder)
+
+    try:
+        files = write_folder(folder, args.models, args.vertices, args.bones, args.submeshes, args.mhdr_version,
+                             args.textures, args.texture_size, extra_files=args.extra_files, seed=args.seed, packed=args.packed, lods=args.lods)
+        archive_path = os.path.join(workdir, "level.sancooked")
+        write_archive(archive_path, files)
+
+        benchmark = Benchmark(folder, args.repeat)
+        benchmark.run_lookup()
+        benchmark.run_archive(archive_path)
+        benchmark.run_parse()
+        if bpy:
+            benchmark.run_blender()
+        else:
+            print("bpy not available, mesh_build and weight_binding skipped (run through blender -b --python)")
+    finally:
+        AssetIndex._loaded.clear()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "blender": bpy.app.version_string if bpy else None,
+            "machine": platform.machine(),
+            "system": platform.system(),
+        },
+        "stages": benchmark.stages,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with a different configuration")
+        print()
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import os
+import struct
+import numpy as np
+
+from sanzarumodelimport.core import (
+    BONE_STRUCT,
+    GEOH_STRUCT,
+    GLOD_STRUCT,
+    MHDR_STRUCT,
+    MSHH_STRUCT,
+    MTLH_NAME_STRUCT,
+    MTLH_PARAMS_STRUCT,
+    MTLH_STRUCT,
+    PACK_BUF_STRUCT,
+    PACKED_SKIN_DTYPE,
+    PACKED_UV_SCALE,
+    PACKED_VERTEX_DTYPE,
+    PICA_FORMATS,
+    PICA_WRAP_REPEAT,
+    SKHD_STRUCT,
+    TXRH_STRUCT,
+    VERTEX_DTYPE,
+    VERTEX_SKINNED_DTYPE,
+)
+
+# Writers for synthetic Sanzaru assets, laid out the way the importer reads them.
+# Only the fields the importer uses carry meaningful data, everything else is zero.
+
+PICA_FORMAT_IDS = {fmt_name: fmt for fmt, (fmt_name, bpp) in PICA_FORMATS.items()}
+
+PADDED_CHUNKS = (b"MSHH", b"MIDX") # The format only pads these payloads to 4 bytes, other chunks follow unaligned
+
+def chunk(chunk_type, payload): # Length counts itself, the padding is not included
+    payload = bytes(payload)
+    padding = -len(payload) % 4 if chunk_type in PADDED_CHUNKS else 0
+    return chunk_type + struct.pack("<I", len(payload) + 4) + payload + b"\0" * padding
+
+def name_hash(name): # Stable non-zero 32 bit hash, zero means "no parent" in BONS
+    value = 0x811C9DC5
+    for byte in name.encode():
+        value = ((value ^ byte) * 0x01000193) & 0xFFFFFFFF
+    value = struct.unpack("<i", struct.pack("<I", value))[0]
+    return value or 1
+
+def write_geo(name, mesh_hash, bone_count=0, switch_distance=0.0, bounds=None, lods=()): # lods: further (mesh hash, switch distance) levels
+    if bounds is None:
+        bounds = (-1.0, -1.0, -1.0, 1.0, 1.0, 1.0)
+    geoh = GEOH_STRUCT.pack(6, *bounds, name_hash(name), 0, 0) + name.encode().ljust(0x2B, b"\0")[:0x2B]
+    body = chunk(b"GEOH", geoh)
+
+    if bone_count:
+        bones = []
+        for i in range(bone_count): # A chain of bones stepping up Z, each parented to the previous one
+            parent = name_hash(f"bone{i - 1}") if i else 0
+            bones.append(BONE_STRUCT.pack(name_hash(f"bone{i}"), parent, 1, 0, 0, 0, 0, 1, 0, 0, i * 0.1, f"bone{i}".encode()))
+        skel = chunk(b"SKHD", SKHD_STRUCT.pack(0, bone_count)) + chunk(b"BONS", b"".join(bones))
+        body += chunk(b"SKEL", skel)
+
+    body += chunk(b"GLOD", GLOD_STRUCT.pack(0, mesh_hash, switch_distance))
+    for lod_hash, lod_distance in lods:
+        body += chunk(b"GLOD", GLOD_STRUCT.pack(0, lod_hash, lod_distance))
+    return chunk(b"GEOB", body)
+
+def write_mhdr(version, vertex_count, index_count, material_hash, vertex_scale=1.0,
+               vertex_pack=(0, 0), index_pack=(0, 0), stream1_size=0): # Pack buffers are (offset, size), size 0 when unpacked
+    data = MHDR_STRUCT.pack(version, vertex_count, index_count, 0, material_hash, 0)
+    if version:
+        data += struct.pack("<f", vertex_scale)
+        if version >= 2:
+            data += b"\0" # vis_group
+    if version >= 3:
+        data += PACK_BUF_STRUCT.pack(*vertex_pack)
+    if version >= 4:
+        data += bytes(0xC) # bound sphere
+        data += PACK_BUF_STRUCT.pack(*index_pack) + struct.pack("<I", stream1_size)
+    if version >= 5:
+        data += struct.pack("<i", 0) # name hash
+    return data
+
+def make_vertices(vertex_count, palette_size, rng):
+    vertices = np.zeros(vertex_count, VERTEX_SKINNED_DTYPE if palette_size else VERTEX_DTYPE)
+    vertices["coord"] = rng.uniform(-1, 1, (vertex_count, 3))
+    vertices["color"] = rng.integers(0, 256, (vertex_count, 4))
+    vertices["uv"] = rng.uniform(0, 1, (vertex_count, 2))
+    normals = rng.normal(size=(vertex_count, 3))
+    vertices["nrm"] = normals / np.linalg.norm(normals, axis=1, keepdims=True)
+    if palette_size:
+        vertices["idx"] = rng.integers(0, palette_size, (vertex_count, 4))
+        weights = rng.integers(1, 256, (vertex_count, 4))
+        weights[:, 2:] = 0 # Two influences per vertex is typical
+        vertices["weight"] = weights
+    return vertices
+
+def make_faces(vertex_count, rng):
+    face_count = max(vertex_count, 3) * 2 // 3 # Roughly what a closed triangle mesh has
+    return rng.integers(0, vertex_count, (face_count, 3)).astype("<u2")
+
+# The packed layouts come from the importer's own dtypes, not from real assets, so these files only exercise
+# the packed decode path and say nothing about whether that layout matches the game's
+def pack_vertices(vertices, vertex_scale): # Quantize to the packed stream layouts, skin data goes to stream 1
+    packed = np.zeros(len(vertices), PACKED_VERTEX_DTYPE)
+    packed["coord"] = np.rint(vertices["coord"] / vertex_scale)
+    packed["nrm"] = np.rint(vertices["nrm"] * 127)
+    packed["color"] = vertices["color"]
+    packed["uv"] = np.rint(vertices["uv"] / PACKED_UV_SCALE)
+    skin_stream = b""
+    if "idx" in vertices.dtype.names:
+        skin = np.zeros(len(vertices), PACKED_SKIN_DTYPE)
+        skin["idx"] = vertices["idx"]
+        skin["weight"] = vertices["weight"]
+        skin_stream = skin.tobytes()
+    return packed.tobytes(), skin_stream
+
+def write_smsh(vertex_count, material_hash, mhdr_version=1, palette_size=0, rng=None, packed=False):
+    # Packed submeshes (MHDR v4+) carry their streams in an MPAK chunk after MHDR instead of MVTX/MIDX
+    if rng is None:
+        rng = np.random.default_rng(0)
+    faces = make_faces(vertex_count, rng)
+    vertices = make_vertices(vertex_count, palette_size, rng)
+    if packed:
+        vertex_scale = 1 / 1024
+        vertex_stream, skin_stream = pack_vertices(vertices, vertex_scale)
+        index_stream = faces.astype("u1" if vertex_count <= 0x100 else "<u2").tobytes()
+        mhdr_size = len(chunk(b"MHDR", write_mhdr(mhdr_version, vertex_count, faces.size, material_hash)))
+        vertex_offset = 8 + mhdr_size + 8 # SMSH header, MHDR, MPAK header
+        index_offset = vertex_offset + len(vertex_stream) + len(skin_stream)
+        body = chunk(b"MHDR", write_mhdr(mhdr_version, vertex_count, faces.size, material_hash, vertex_scale,
+                                         (vertex_offset, len(vertex_stream)), (index_offset, len(index_stream)), len(skin_stream)))
+        body += chunk(b"MPAK", vertex_stream + skin_stream + index_stream)
+    else:
+        body = chunk(b"MHDR", write_mhdr(mhdr_version, vertex_count, faces.size, material_hash))
+        body += chunk(b"MVTX", vertices.tobytes())
+        body += chunk(b"MIDX", faces.tobytes())
+    if palette_size:
+        body += chunk(b"MPAL", np.arange(palette_size, dtype="<i2").tobytes())
+    return chunk(b"SMSH", body)
+
+def write_mes(mesh_hash, submeshes, mhdr_version=1, palette_size=0, rng=None, packed=False): # submeshes: (vertex count, material hash) pairs
+    body = chunk(b"MSHH", MSHH_STRUCT.pack(0, 0, 0, 0, 0, mesh_hash))
+    for vertex_count, material_hash in submeshes:
+        body += write_smsh(vertex_count, material_hash, mhdr_version, palette_size, rng, packed)
+    return chunk(b"MESH", body)
+
+def write_mat(material_hash, texture_hash, name, diffuse=(1, 1, 1, 1), specular=(0, 0, 0, 1), wrap=(PICA_WRAP_REPEAT, PICA_WRAP_REPEAT)):
+    params = MTLH_PARAMS_STRUCT.pack(*diffuse, *specular, *wrap)
+    mtlh = MTLH_STRUCT.pack(0, texture_hash) + params + MTLH_NAME_STRUCT.pack(material_hash, name.encode())
+    return chunk(b"MATL", chunk(b"MTLH", mtlh))
+
+def write_ctpk(width, height, fmt_name="ETC1", rng=None):
+    if rng is None:
+        rng = np.random.default_rng(0)
+    fmt = PICA_FORMAT_IDS[fmt_name]
+    size = width * height * PICA_FORMATS[fmt][1] // 8
+    tex_offset = 0x40
+    header = struct.pack("<4sHHI", b"CTPK", 1, 1, tex_offset).ljust(0x20, b"\0")
+    entry = struct.pack("<IIIIHH", 0, size, 0, fmt, width, height).ljust(0x20, b"\0")
+    return header + entry + rng.integers(0, 256, size, np.uint8).tobytes()
+
+def write_tex(texture_hash, name, width=64, height=64, fmt_name="ETC1", rng=None):
+    txrh = TXRH_STRUCT.pack(0, texture_hash, name.encode())
+    return chunk(b"TEXR", chunk(b"TXRH", txrh) + chunk(b"T3DS", write_ctpk(width, height, fmt_name, rng)))
+
+def write_folder(folder, models=4, vertices=1000, bones=32, submeshes=2, mhdr_version=1,
+                 textures=2, texture_size=64, texture_format="ETC1", extra_files=0, seed=0, packed=False, lods=1):
+    # Level folder of models sharing a pool of materials/textures, extra_files pads the folder
+    # with unreferenced meshes to measure hash lookups against larger extractions.
+    # Each further detail level halves the vertex count and switches 20 units further out
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    files = {}
+
+    def add(name, data):
+        files[name] = data
+        with open(os.path.join(folder, name), "wb") as file:
+            file.write(data)
+
+    material_hashes = []
+    for i in range(max(textures, 1)):
+        texture_hash = name_hash(f"texture{i}")
+        material_hashes.append(name_hash(f"material{i}"))
+        add(f"texture{i}.tex", write_tex(texture_hash, f"texture{i}", texture_size, texture_size, texture_format, rng))
+        add(f"material{i}.mat", write_mat(material_hashes[i], texture_hash, f"material{i}"))
+
+    palette_size = min(bones, 0x7F) # Vertex palette indices are signed bytes
+    for i in range(models):
+        mesh_hash = name_hash(f"mesh{i}")
+        parts = [(vertices, material_hashes[(i + k) % len(material_hashes)]) for k in range(submeshes)]
+        lod_meshes = []
+        for lod in range(1, lods):
+            lod_parts = [(max(vertex_count >> lod, 3), material_hash) for vertex_count, material_hash in parts]
+            lod_meshes.append((name_hash(f"mesh{i}_lod{lod}"), lod_parts))
+        add(f"model{i}.geo", write_geo(f"model{i}", mesh_hash, bones, lods=[(lod_hash, lod * 20.0) for lod, (lod_hash, lod_parts) in enumerate(lod_meshes, 1)]))
+        add(f"model{i}.mes", write_mes(mesh_hash, parts, mhdr_version, palette_size, rng, packed))
+        for lod, (lod_hash, lod_parts) in enumerate(lod_meshes, 1):
+            add(f"model{i}_lod{lod}.mes", write_mes(lod_hash, lod_parts, mhdr_version, palette_size, rng, packed))
+
+    for i in range(extra_files):
+        add(f"unused{i}.mes", write_mes(name_hash(f"unused{i}"), [(3, 0)], mhdr_version, 0, rng))
+
+    return files
+
+def write_archive(path, files): # Sancooked archive holding every file in one container chunk
+    payload = b"".join(files[name] for name in sorted(files))
+    container = b"DATA" + struct.pack("<I", len(payload) + 4) + payload
+    with open(path, "wb") as file:
+        file.write(bytes(0x20) + struct.pack("<II", 1, 0) + container)
@@ -0,0 +1,20 @@
+bl_info = {
+    "name": "Sonic Boom/Sanzaru Model Importer",
+    "description": "Model importer for the 3DS Sonic Boom games and other Sanzaru games",
+    "author": "AdelQ",
+    "version": (0, 9),
+    "blender": (3, 6, 5),
+    "location": "File > Import",
+    "category": "Import-Export",
+}
+
+# Only the Blender side imports bpy, so the parsing core can also be imported by worker
+# processes and command line tools running outside of Blender
+
+def register():
+    from . import importer
+    importer.register()
+
+def unregister():
+    from . import importer
+    importer.unregister()
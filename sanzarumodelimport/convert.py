@@ -0,0 +1,333 @@
+import argparse
+import io
+import json
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+import numpy as np
+
+from .core import DecodePool, SanzaruMaterial, close_sources, open_source, parse_geo, parse_model, parse_texr
+
+
+# glTF constants
+GLTF_FLOAT = 5126
+GLTF_UNSIGNED_SHORT = 5123
+GLTF_ARRAY_BUFFER = 34962
+GLTF_ELEMENT_ARRAY_BUFFER = 34963
+GLB_MAGIC = 0x46546C67
+GLB_JSON = 0x4E4F534A
+GLB_BIN = 0x004E4942
+
+TEXTURE_FOLDER = "textures"
+
+def safe_name(name):
+    return re.sub(r'[^\w.-]', "_", name) or "unnamed"
+
+def texture_file(texture): # Relative path a texture is written to, shared by every model in the output folder
+    # The hash keeps different textures that share a name apart
+    return f"{TEXTURE_FOLDER}/{safe_name(texture.name.split('.')[0])}_{texture.hash & 0xFFFFFFFF:08x}.png"
+
+def unique_path(used, owner, path): # Output path per input or model, clashing names get a numbered suffix
+    name, number = path, 1
+    while used.setdefault(path.lower(), owner) != owner: # Lowercase, names only differing in case clash on Windows
+        number += 1
+        path = f"{name}_{number}"
+    return path
+
+class GLTFBuilder:
+    def __init__(self):
+        self.gltf = {
+            "asset": {"version": "2.0", "generator": "sanzarumodelimport"},
+            "buffers": [],
+            "bufferViews": [],
+            "accessors": [],
+        }
+        self.binary = io.BytesIO()
+
+    def add(self, key, item):
+        self.gltf.setdefault(key, []).append(item)
+        return len(self.gltf[key]) - 1
+
+    def add_accessor(self, array, accessor_type, component_type, target=None, bounds=False):
+        data = np.ascontiguousarray(array).tobytes()
+        offset = self.binary.tell()
+        self.binary.write(data)
+        self.binary.write(b"\x00" * (-len(data) % 4)) # Accessors need 4 byte alignment
+        view = {"buffer": 0, "byteOffset": offset, "byteLength": len(data)}
+        if target:
+            view["target"] = target
+        accessor = {
+            "bufferView": self.add("bufferViews", view),
+            "componentType": component_type,
+            "count": len(array),
+            "type": accessor_type,
+        }
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        return self.add("accessors", accessor)
+
+    def write_glb(self, path):
+        binary = self.binary.getvalue()
+        self.gltf["buffers"] = [{"byteLength": len(binary)}]
+        json_data = json.dumps(self.gltf, separators=(",", ":")).encode()
+        json_data += b" " * (-len(json_data) % 4)
+        with open(path, "wb") as file:
+            file.write(struct.pack("<III", GLB_MAGIC, 2, 12 + 8 + len(json_data) + 8 + len(binary)))
+            file.write(struct.pack("<II", len(json_data), GLB_JSON))
+            file.write(json_data)
+            file.write(struct.pack("<II", len(binary), GLB_BIN))
+            file.write(binary)
+
+def bone_matrices(geo): # Model space bone matrices from the BONS x/z basis and position
+    matrices = np.zeros((geo.bone_count, 4, 4), np.float64)
+    y_basis = np.cross(geo.bone_z_basis, geo.bone_x_basis)
+    matrices[:, :3, 0] = geo.bone_x_basis
+    matrices[:, :3, 1] = y_basis
+    matrices[:, :3, 2] = geo.bone_z_basis
+    matrices[:, :3, 3] = geo.bone_positions
+    matrices[:, 3, 3] = 1
+    return matrices
+
+def skin_attributes(submesh): # Palette indices resolved to bone indices, weights normalised to sum to 1
+    palette = submesh.weight.pal.astype(np.int32)
+    slots = submesh.vertex.idx.astype(np.int32)
+    valid = (slots >= 0) & (slots < len(palette))
+    joints = palette[np.where(valid, slots, 0)] if len(palette) else np.zeros_like(slots)
+    joints = np.where(valid, joints, 0)
+    weights = np.where(valid, submesh.vertex.weight, 0).astype(np.float32)
+    totals = weights.sum(axis=1, keepdims=True)
+    weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals > 0)
+    weights[totals[:, 0] == 0, 0] = 1
+    return joints.astype(np.uint16), weights
+
+def write_gltf(model, materials, textures, path):
+    geo = model.geo
+    builder = GLTFBuilder()
+    root = {"name": geo.name, "children": []}
+    builder.add("nodes", root)
+
+    # Materials and texture references, in order of first use
+    material_indices = {}
+    texture_indices = {}
+    for submesh in model.submeshes:
+        mat_hash = submesh.material_hash
+        if mat_hash in material_indices:
+            continue
+        mat = materials[mat_hash]
+        material = {"name": mat.material_name, "pbrMetallicRoughness": {"metallicFactor": 0.0}}
+        texture = textures.get(mat.texture_hash)
+        if texture is not None:
+            if mat.texture_hash not in texture_indices:
+                image = builder.add("images", {"name": texture.name, "uri": texture_file(texture)})
+                if "samplers" not in builder.gltf:
+                    builder.add("samplers", {})
+                texture_indices[mat.texture_hash] = builder.add("textures", {"source": image, "sampler": 0})
+            material["pbrMetallicRoughness"]["baseColorTexture"] = {"index": texture_indices[mat.texture_hash]}
+        material_indices[mat_hash] = builder.add("materials", material)
+
+    # One primitive per submesh, the vertex scale is baked into the positions
+    primitives = []
+    for submesh in model.submeshes:
+        vertex = submesh.vertex
+        if not vertex.count:
+            continue
+        normals = vertex.nrm.astype(np.float32)
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+        uvs = vertex.uv * np.float32((1, -1)) + np.float32((0, 1)) # Back to top left origin
+        attributes = {
+            "POSITION": builder.add_accessor((vertex.coord * submesh.vertex_scale).astype(np.float32), "VEC3", GLTF_FLOAT, GLTF_ARRAY_BUFFER, bounds=True),
+            "NORMAL": builder.add_accessor(normals, "VEC3", GLTF_FLOAT, GLTF_ARRAY_BUFFER),
+            "TEXCOORD_0": builder.add_accessor(uvs, "VEC2", GLTF_FLOAT, GLTF_ARRAY_BUFFER),
+            "COLOR_0": builder.add_accessor(vertex.color.astype(np.float32), "VEC4", GLTF_FLOAT, GLTF_ARRAY_BUFFER),
+        }
+        if geo.bone_count and submesh.get_weights:
+            joints, weights = skin_attributes(submesh)
+            attributes["JOINTS_0"] = builder.add_accessor(joints, "VEC4", GLTF_UNSIGNED_SHORT, GLTF_ARRAY_BUFFER)
+            attributes["WEIGHTS_0"] = builder.add_accessor(weights, "VEC4", GLTF_FLOAT, GLTF_ARRAY_BUFFER)
+        indices = submesh.face.idx.astype(np.uint16).ravel()
+        primitives.append({
+            "attributes": attributes,
+            "indices": builder.add_accessor(indices, "SCALAR", GLTF_UNSIGNED_SHORT, GLTF_ELEMENT_ARRAY_BUFFER),
+            "material": material_indices[submesh.material_hash],
+        })
+
+    if primitives:
+        mesh_node = {"name": f"{geo.name}_mesh", "mesh": builder.add("meshes", {"name": geo.name, "primitives": primitives})}
+        root["children"].append(builder.add("nodes", mesh_node))
+
+    # Skeleton, bone nodes carry their transform relative to the parent bone
+    if geo.bone_count:
+        world = bone_matrices(geo)
+        parents = geo.bone_parent_indices
+        first_node = len(builder.gltf["nodes"])
+        for i in range(geo.bone_count):
+            local = world[i] if parents[i] < 0 else np.linalg.inv(world[parents[i]]) @ world[i]
+            builder.add("nodes", {"name": geo.bone_names[i], "matrix": local.T.ravel().tolist()})
+        for i, parent in enumerate(parents):
+            if parent < 0:
+                root["children"].append(first_node + i)
+            else:
+                builder.gltf["nodes"][first_node + parent].setdefault("children", []).append(first_node + i)
+
+        inverse_bind = np.linalg.inv(world).transpose(0, 2, 1).astype(np.float32) # Column major
+        skin = {
+            "joints": list(range(first_node, first_node + geo.bone_count)),
+            "inverseBindMatrices": builder.add_accessor(inverse_bind.reshape(-1, 16), "MAT4", GLTF_FLOAT),
+        }
+        if primitives:
+            mesh_node["skin"] = builder.add("skins", skin)
+
+    builder.gltf["scenes"] = [{"nodes": [0]}]
+    builder.gltf["scene"] = 0
+    builder.write_glb(path)
+
+def write_obj(model, materials, textures, path): # Static geometry only, skinned models are written in bind pose
+    geo = model.geo
+    mtl_path = os.path.splitext(path)[0] + ".mtl"
+    obj = io.StringIO()
+    obj.write(f"mtllib {os.path.basename(mtl_path)}\n")
+    vertex_offset = 1
+    for i, submesh in enumerate(model.submeshes):
+        vertex = submesh.vertex
+        obj.write(f"o {safe_name(geo.name)}_submesh{str(i).zfill(2)}\n")
+        np.savetxt(obj, vertex.coord * submesh.vertex_scale, fmt="v %.6f %.6f %.6f")
+        np.savetxt(obj, vertex.uv, fmt="vt %.6f %.6f")
+        np.savetxt(obj, vertex.nrm, fmt="vn %.6f %.6f %.6f")
+        obj.write(f"usemtl {safe_name(materials[submesh.material_hash].material_name)}\n")
+        faces = np.repeat(submesh.face.idx.astype(np.int64) + vertex_offset, 3, axis=1)
+        np.savetxt(obj, faces, fmt="f %d/%d/%d %d/%d/%d %d/%d/%d")
+        vertex_offset += vertex.count
+    with open(path, "w") as file:
+        file.write(obj.getvalue())
+
+    with open(mtl_path, "w") as file:
+        for mat_hash in dict.fromkeys(submesh.material_hash for submesh in model.submeshes):
+            mat = materials[mat_hash]
+            file.write(f"newmtl {safe_name(mat.material_name)}\n")
+            texture = textures.get(mat.texture_hash)
+            if texture is not None:
+                file.write(f"map_Kd {texture_file(texture)}\n")
+
+def write_png(texture, path): # Minimal RGBA8 PNG writer, rows go top to bottom
+    rgba = (np.clip(texture.pixels[::-1], 0, 1) * 255 + 0.5).astype(np.uint8)
+    rows = np.zeros((texture.height, 1 + texture.width * 4), np.uint8) # Filter byte 0 per row
+    rows[:, 1:] = rgba.reshape(texture.height, -1)
+
+    def png_chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    with open(path, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        file.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", texture.width, texture.height, 8, 6, 0, 0, 0)))
+        file.write(png_chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        file.write(png_chunk(b"IEND", b""))
+
+# Worker entry points
+def geo_name(source_path, geo_key): # Output name of a model, read up front so clashing names can be numbered
+    try:
+        return safe_name(parse_geo(open_source(source_path).read_geo(geo_key)).name)
+    except Exception: # Conversion reports the error
+        return safe_name(str(geo_key))
+
+def convert_model(source_path, geo_key, out_dir, fmt, name):
+    try:
+        source = open_source(source_path)
+        model = parse_model(source.read_geo(geo_key), source)
+        materials = {}
+        textures = {}
+        for submesh in model.submeshes:
+            if submesh.material_hash not in materials:
+                mat = SanzaruMaterial(source.open(".mat", submesh.material_hash))
+                materials[submesh.material_hash] = mat
+                if mat.texture_hash not in textures:
+                    textures[mat.texture_hash] = parse_texr(source.open(".tex", mat.texture_hash), decode=False)
+
+        path = os.path.join(out_dir, name + "." + fmt)
+        if fmt == "glb":
+            write_gltf(model, materials, textures, path)
+        else:
+            write_obj(model, materials, textures, path)
+        texture_jobs = [(source_path, texture.hash, os.path.join(out_dir, texture_file(texture))) for texture in textures.values()]
+        return model.geo.name, model.vertex_count, texture_jobs, None
+    except Exception as error: # Any broken model is reported, the rest of the batch still converts
+        return str(geo_key), 0, [], f"{type(error).__name__}: {error}"
+
+def convert_texture(source_path, texture_hash, path):
+    try:
+        texture = parse_texr(open_source(source_path).open(".tex", texture_hash))
+        write_png(texture, path)
+        return None
+    except Exception as error:
+        return f"{os.path.basename(path)}: {type(error).__name__}: {error}"
+
+def conversion_jobs(inputs, out_dir, fmt): # (source path, geo key, output folder, format) per model
+    jobs = []
+    targets = {} # Output subfolder -> input path, lowercase
+    for path in inputs:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            target = unique_path(targets, path, os.path.join(out_dir, safe_name(os.path.basename(path))))
+            source = open_source(path) # Build the folder index once here so workers only load it
+            jobs.extend((path, key, target, fmt) for key in source.geo_keys())
+        elif path.lower().endswith(".geo"):
+            folder = os.path.dirname(path)
+            open_source(folder)
+            jobs.append((folder, os.path.basename(path), out_dir, fmt))
+        else: # Sancooked archive, the extension keeps it apart from an extracted folder of the same name
+            target = unique_path(targets, path, os.path.join(out_dir, safe_name(os.path.basename(path).replace(".", "_"))))
+            jobs.extend((path, key, target, fmt) for key in open_source(path).geo_keys())
+    return list(dict.fromkeys(jobs)) # Inputs given twice are converted once
+
+def name_jobs(jobs, names): # Adds the output name to each job, models sharing a name in one folder are numbered
+    used = {}
+    return [job + (os.path.basename(unique_path(used, job[:2], os.path.join(job[2], name))),) for job, name in zip(jobs, names)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m sanzarumodelimport.convert",
+        description="Convert Sanzaru .geo models to binary glTF or OBJ without Blender.",
+    )
+    parser.add_argument("inputs", nargs="+", help=".geo files, folders of extracted files or .sancooked archives")
+    parser.add_argument("-o", "--output", default=".", help="Output folder (default: current folder)")
+    parser.add_argument("-f", "--format", choices=("glb", "obj"), default="glb", help="Output format (default: glb)")
+    parser.add_argument("-j", "--workers", type=int, default=0, help="Worker processes, 0 uses every core (default: 0)")
+    parser.add_argument("--no-textures", action="store_true", help="Only reference textures, do not decode them to PNG")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    jobs = conversion_jobs(args.inputs, os.path.abspath(args.output), args.format)
+    for target in {job[2] for job in jobs}:
+        os.makedirs(os.path.join(target, TEXTURE_FOLDER), exist_ok=True)
+
+    errors = []
+    with DecodePool(args.workers) as pool:
+        jobs = name_jobs(jobs, pool.map(geo_name, [job[:2] for job in jobs]))
+        results = pool.map(convert_model, jobs)
+        texture_jobs = {}
+        vertex_count = 0
+        for name, vertices, model_textures, error in results:
+            if error:
+                errors.append(f"{name}: {error}")
+                continue
+            vertex_count += vertices
+            for job in model_textures:
+                texture_jobs.setdefault(job[2], job) # Textures shared by several models are decoded once
+        if not args.no_textures:
+            errors.extend(error for error in pool.map(convert_texture, list(texture_jobs.values())) if error)
+    close_sources()
+
+    total_time = time.perf_counter() - start_time
+    converted = len(jobs) - sum(1 for result in results if result[3])
+    print(f"Converted {converted} models ({vertex_count} vertices) and {0 if args.no_textures else len(texture_jobs)} textures "
+          f"in {total_time:.2f} s, {converted * 60 / max(total_time, 1e-6):.0f} models/min")
+    for error in errors:
+        print(f"Failed: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
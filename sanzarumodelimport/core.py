@@ -0,0 +1,1240 @@
+import struct
+import os
+import json
+import hashlib
+import mmap
+import time
+import multiprocessing
+import contextlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+
+class SanzaruGEOB:
+    def __init__(self, data):
+        self.name = ""
+        self.bone_count = 0
+        self.bone_x_basis = np.empty((0, 3), np.float32)
+        self.bone_z_basis = np.empty((0, 3), np.float32)
+        self.bone_positions = np.empty((0, 3), np.float32)
+        self.bone_names = []
+        self.bone_parents = []
+        self.bone_parent_indices = [] # -1 for root bones
+        self.bounds_min = (0.0, 0.0, 0.0)
+        self.bounds_max = (0.0, 0.0, 0.0)
+        self.hash = 0 # Mesh hash of the first GLOD entry
+        self.lods = [] # (mesh hash, switch distance) per GLOD entry, highest detail first
+
+        # GEOB - GEOB Identifier 
+        geob = read_root_chunk(data, b"GEOB")
+        view = geob.view
+
+        # GEOH - Geo Header           
+        geoh = geob.child(b"GEOH")
+        geoh_version, *bounds, name_hash, anim_hash, light_group = GEOH_STRUCT.unpack_from(view, geoh.start)
+        self.bounds_min = tuple(bounds[:3])
+        self.bounds_max = tuple(bounds[3:])
+        name_offset = geoh.start + GEOH_STRUCT.size
+        self.name = read_string(view, name_offset, min(0x2B, geoh.end - name_offset)) # Max string length found is 0x19, made longer just in case. May break with versions <6
+        
+        # SKEL - Skeleton Header
+        skel = geob.find(b"SKEL")
+        if skel:
+            # SKHD - Skeleton Header
+            skhd = skel.child(b"SKHD")
+            skhd_version, self.bone_count = SKHD_STRUCT.unpack_from(view, skhd.start)
+
+            # BONS - Bones chunk
+            bons = skel.child(b"BONS")
+            bons.check_size(self.bone_count * BONE_STRUCT.size)
+            
+            bone_hashes = {}
+            bone_indices = {}
+            bone_parent_hashes = []
+            bone_bases = []
+            
+            bone_data = view[bons.start:bons.start + self.bone_count * BONE_STRUCT.size]
+            for bone in BONE_STRUCT.iter_unpack(bone_data):
+                bone_name_hash, parent_name_hash = bone[0:2]
+                bone_name = bone[11].split(b'\x00')[0].decode()
+
+                bone_name_hash = str(bone_name_hash)
+                parent_name_hash = str(parent_name_hash)
+                
+                self.bone_names.append(bone_name)
+                bone_bases.append(bone[2:11]) # x basis, z basis, position
+                bone_hashes.update({bone_name_hash:bone_name})
+                bone_indices.setdefault(bone_name_hash, len(self.bone_names) - 1)
+                bone_parent_hashes.append(parent_name_hash)
+            
+            bone_bases = np.array(bone_bases, np.float32).reshape(-1, 3, 3)
+            self.bone_x_basis = bone_bases[:, 0]
+            self.bone_z_basis = bone_bases[:, 1]
+            self.bone_positions = bone_bases[:, 2]
+            
+            # Match hashes with indices
+            for i in range(self.bone_count):
+                if bone_parent_hashes[i] == "0":
+                    self.bone_parents.append("@none")
+                    self.bone_parent_indices.append(-1)
+                else:
+                    self.bone_parents.append(bone_hashes[bone_parent_hashes[i]])
+                    self.bone_parent_indices.append(bone_indices[bone_parent_hashes[i]])
+            
+        # GLOD - GLOD Identifier, one per detail level
+        geob.child(b"GLOD")
+        for glod in geob.find_all(b"GLOD"):
+            glod_version, mesh_hash, switch_distance = GLOD_STRUCT.unpack_from(view, glod.start) # Version always 0
+            self.lods.append((mesh_hash, switch_distance))
+        self.hash = self.lods[0][0]
+        
+# MVTX vertex layouts
+VERTEX_DTYPE = np.dtype([
+    ("coord", "<f4", 3),
+    ("color", "u1", 4),
+    ("uv", "<f4", 2),
+    ("nrm", "<f4", 3),
+]) # 0x28 bytes
+VERTEX_SKINNED_DTYPE = np.dtype([
+    ("coord", "<f4", 3),
+    ("color", "u1", 4),
+    ("uv", "<f4", 2),
+    ("nrm", "<f4", 3),
+    ("idx", "i1", 4),
+    ("weight", "u1", 4),
+]) # 0x30 bytes
+
+# Packed streams declared in MHDR v3+, offsets are relative to the SMSH chunk.
+# Positions are raw int16 scaled by vertex_scale like MVTX coordinates, skin data lives in stream 1.
+# The layout is inferred, streams that don't match it in size or decode to implausible normals, positions or
+# indices are skipped in favour of MVTX/MIDX
+PACKED_VERTEX_DTYPE = np.dtype([
+    ("coord", "<i2", 3),
+    ("nrm", "i1", 3),
+    ("pad", "u1"),
+    ("color", "u1", 4),
+    ("uv", "<i2", 2),
+]) # 0x12 bytes
+PACKED_SKIN_DTYPE = np.dtype([
+    ("idx", "i1", 4),
+    ("weight", "u1", 4),
+]) # 0x8 bytes
+PACKED_NORMAL_SCALE = np.float32(1 / 127)
+PACKED_UV_SCALE = np.float32(1 / 1024)
+PACKED_INDEX_DTYPES = {1: np.dtype("u1"), 2: np.dtype("<u2")} # Index size in bytes -> dtype
+PACKED_NORMAL_TOLERANCE = 0.05 # Allowed deviation from unit length of a decoded packed normal
+PACKED_BOUNDS_MARGIN = 0.25 # Fraction of the GEOH bounds size packed positions may lie outside them
+
+class SanzaruSubmesh:    
+    class Vertex:
+        def __init__(self):
+            self.count = 0
+            self.coord = np.empty((0, 3), np.float32)
+            self.uv = np.empty((0, 2), np.float32)
+            self.nrm = np.empty((0, 3), np.float32)
+            self.idx = np.empty((0, 4), np.int8)
+            self.color = np.empty((0, 4), np.float32)
+            self.weight = np.empty((0, 4), np.float32)
+        
+    class Face:
+        def __init__(self):
+            self.count = 0
+            self.idx = np.empty((0, 3), np.uint16)
+            
+    class Weight:
+        def __init__(self):
+            self.pal = np.empty(0, np.int16)
+
+    def __init__(self, smsh, geo):
+        self.vertex = self.Vertex()
+        self.face = self.Face()
+        self.weight = self.Weight()
+        self.length = 0
+        self.vertex_scale = 1.0
+        self.material_hash = 0
+        self.vertex_pack = (0, 0) # Packed stream offset and size, size 0 when absent
+        self.index_pack = (0, 0)
+        self.stream1_pack_size = 0
+        self.content_hash = "" # Identical geometry across files hashes the same
+        self.bounds = (geo.bounds_min, geo.bounds_max) # Packed positions are checked against these
+        self.get_weights = False
+        if geo.bone_count:
+            self.get_weights = True
+        
+        # SMSH - Submesh Identifier 
+        self.length = smsh.length
+        with profile_stage("mhdr_parse"):
+            self.read_header(smsh.child(b"MHDR"))
+        hashed = self.decode_vertices(smsh) + self.decode_faces(smsh)
+        if self.get_weights:
+            mpal = smsh.child(b"MPAL")
+            with profile_stage("mpal_decode", bytes=mpal.length):
+                self.read_palette(mpal)
+            hashed += chunk_buffers(mpal)
+        with profile_stage("submesh_hash"):
+            self.content_hash = hash_buffers(hashed)
+
+    # Packed streams are used when they fit the expected layout and decode to plausible geometry, otherwise MVTX/MIDX.
+    # Both return the buffers to hash
+    def decode_vertices(self, smsh):
+        vertex_stream = packed_stream(smsh, *self.vertex_pack, self.vertex.count * PACKED_VERTEX_DTYPE.itemsize)
+        skin_stream = None
+        if self.get_weights and vertex_stream is not None: # Stream 1 follows the vertex stream
+            skin_stream = packed_stream(smsh, self.vertex_pack[0] + self.vertex_pack[1], self.stream1_pack_size,
+                                        self.vertex.count * PACKED_SKIN_DTYPE.itemsize)
+            if skin_stream is None: # Packed stream without usable skin data, only MVTX has the weights
+                vertex_stream = None
+        if vertex_stream is not None:
+            hashed = [CHUNK_HEADER.pack(b"VPAK", len(vertex_stream)), vertex_stream]
+            with profile_stage("packed_vertex_decode", vertices=self.vertex.count, bytes=len(vertex_stream)):
+                self.read_packed_vertices(vertex_stream)
+                if skin_stream is not None:
+                    self.read_packed_skin(skin_stream)
+                    hashed += [CHUNK_HEADER.pack(b"SPAK", len(skin_stream)), skin_stream]
+                plausible = self.packed_vertices_plausible()
+            if plausible:
+                return hashed
+        mvtx = smsh.find(b"MVTX")
+        if mvtx is None:
+            problem = "Implausible packed vertex stream" if vertex_stream is not None else "No usable packed vertex stream"
+            raise ValueError(f"{problem} and no MVTX chunk in SMSH chunk at {hex_offset(smsh.offset)}")
+        with profile_stage("mvtx_decode", vertices=self.vertex.count, bytes=mvtx.length):
+            self.read_vertices(mvtx)
+        return chunk_buffers(mvtx)
+
+    def decode_faces(self, smsh):
+        index_sizes = [self.face.count * 3 * index_dtype.itemsize for index_dtype in PACKED_INDEX_DTYPES.values()]
+        index_stream = packed_stream(smsh, *self.index_pack, *index_sizes)
+        if index_stream is not None:
+            with profile_stage("packed_index_decode", faces=self.face.count, bytes=len(index_stream)):
+                self.read_packed_faces(index_stream)
+            if not self.face.idx.size or self.face.idx.max() < self.vertex.count: # Out of range indices mean another layout
+                return [CHUNK_HEADER.pack(b"IPAK", len(index_stream)), index_stream]
+        midx = smsh.find(b"MIDX")
+        if midx is None:
+            problem = "Implausible packed index stream" if index_stream is not None else "No usable packed index stream"
+            raise ValueError(f"{problem} and no MIDX chunk in SMSH chunk at {hex_offset(smsh.offset)}")
+        with profile_stage("midx_decode", faces=self.face.count, bytes=midx.length):
+            self.read_faces(midx)
+        return chunk_buffers(midx)
+
+    def packed_vertices_plausible(self): # The packed layout is inferred, so a stream that merely has the right size isn't trusted
+        # Quantized normals are unit length (or zero)
+        lengths = np.sqrt(np.einsum("ij,ij->i", self.vertex.nrm, self.vertex.nrm))
+        if np.any((lengths > 0) & (np.abs(lengths - 1) > PACKED_NORMAL_TOLERANCE)):
+            return False
+        # Positions lie within the GEOH bounds, unless those are empty
+        low, high = np.float32(self.bounds[0]), np.float32(self.bounds[1])
+        if self.vertex.count and np.all(high >= low) and np.any(high > low):
+            margin = (high - low) * PACKED_BOUNDS_MARGIN + np.float32(1e-3)
+            coords = self.vertex.coord * np.float32(self.vertex_scale)
+            if np.any(coords < low - margin) or np.any(coords > high + margin):
+                return False
+        return True
+
+    def read_header(self, mhdr): # MHDR - Model Header
+        view = mhdr.view
+        offset = mhdr.start
+        mhdr_version, self.vertex.count, idx_count, primitive_type, self.material_hash, vertex_def_hash = MHDR_STRUCT.unpack_from(view, offset)
+        offset += MHDR_STRUCT.size
+        self.face.count = idx_count // 3
+        if mhdr_version:
+            self.vertex_scale = FLOAT_STRUCT.unpack_from(view, offset)[0]
+            offset += 4
+            if mhdr_version >= 2:
+                offset += 1 # vis_group
+                # GOTO: LABEL_6:
+        else:
+            self.vertex_scale = 1.0
+        
+        # LABEL_6:
+        if mhdr_version >= 3:
+            self.vertex_pack = PACK_BUF_STRUCT.unpack_from(view, offset) # vertex_pack_buf offset and size
+            offset += PACK_BUF_STRUCT.size
+        if mhdr_version >= 4:
+            offset += 0xC # bound sphere
+            self.index_pack = PACK_BUF_STRUCT.unpack_from(view, offset) # idx_pack_buf offset and size
+            offset += PACK_BUF_STRUCT.size
+            self.stream1_pack_size = struct.unpack_from("<I", view, offset)[0] # stream1_pack_buf_size
+            offset += 4
+            
+        if mhdr_version >= 5:
+            name_hash = HASH_STRUCT.unpack_from(view, offset)[0]
+        # Rest of MHDR is unknown/incomplete data, length still varies despite identical version numbers
+
+    def read_vertices(self, mvtx): # MVTX - Vertex Data
+        vertex_dtype = VERTEX_SKINNED_DTYPE if self.get_weights else VERTEX_DTYPE
+        vertex_data = mvtx.array(vertex_dtype, self.vertex.count)
+        
+        # Copy out of the interleaved buffer so each attribute is contiguous
+        self.vertex.coord = np.ascontiguousarray(vertex_data["coord"]) # Scale applied to mesh to apply non-destructively
+        self.vertex.color = vertex_data["color"] / np.float32(255)
+        self.vertex.uv = vertex_data["uv"] * np.float32((1, -1)) + np.float32((0, 1)) # Invert UVs
+        self.vertex.nrm = np.ascontiguousarray(vertex_data["nrm"])
+        if self.get_weights:
+            self.vertex.idx = np.ascontiguousarray(vertex_data["idx"])
+            self.vertex.weight = vertex_data["weight"] / np.float32(255)
+
+    def read_packed_vertices(self, data): # Quantized vertex_pack_buf
+        if len(data) != self.vertex.count * PACKED_VERTEX_DTYPE.itemsize:
+            raise ValueError("Unexpected packed vertex stream size")
+        vertex_data = np.frombuffer(data, PACKED_VERTEX_DTYPE, self.vertex.count)
+        self.vertex.coord = vertex_data["coord"].astype(np.float32)
+        self.vertex.color = vertex_data["color"] / np.float32(255)
+        self.vertex.uv = vertex_data["uv"] * np.float32((PACKED_UV_SCALE, -PACKED_UV_SCALE)) + np.float32((0, 1)) # Invert UVs
+        self.vertex.nrm = vertex_data["nrm"].astype(np.float32) * PACKED_NORMAL_SCALE
+
+    def read_packed_skin(self, data): # Stream 1, palette indices and byte weights
+        if len(data) != self.vertex.count * PACKED_SKIN_DTYPE.itemsize:
+            raise ValueError("Unexpected packed skin stream size")
+        skin_data = np.frombuffer(data, PACKED_SKIN_DTYPE, self.vertex.count)
+        self.vertex.idx = skin_data["idx"].copy()
+        self.vertex.weight = skin_data["weight"] / np.float32(255)
+
+    def read_packed_faces(self, data): # idx_pack_buf, index size follows from the stream size
+        index_dtype = PACKED_INDEX_DTYPES.get(len(data) // max(self.face.count * 3, 1))
+        if index_dtype is None or len(data) != self.face.count * 3 * index_dtype.itemsize:
+            raise ValueError("Unexpected packed index stream size")
+        self.face.idx = np.frombuffer(data, index_dtype).astype(np.uint16).reshape(-1, 3)
+
+    # Index and palette arrays are copied so the decoded submesh does not keep the mapped file open
+    def read_faces(self, midx): # MIDX - Face Index
+        self.face.idx = midx.array(np.dtype("<u2"), self.face.count * 3).reshape(-1, 3).copy()
+
+    def read_palette(self, mpal): # MPAL - Weight pallete
+        self.weight.pal = mpal.array(np.dtype("<i2"), (mpal.end - mpal.start) // 2).copy()
+
+    def weight_batches(self): # Group influences by palette index and byte weight, one batch per vertex group add call
+        vertex_count = self.vertex.count
+        vertex_i = np.repeat(np.arange(vertex_count, dtype=np.int32), 4)
+        ref_i = self.vertex.idx.ravel().astype(np.int32)
+        weight = np.rint(self.vertex.weight.ravel() * 255).astype(np.int32)
+        
+        valid = (weight > 0) & (ref_i >= 0) & (ref_i < len(self.weight.pal))
+        vertex_i, ref_i, weight = vertex_i[valid], ref_i[valid], weight[valid]
+        
+        # Same palette entry listed twice on a vertex, last one wins like sequential REPLACE adds
+        pair = vertex_i * 256 + ref_i
+        _, last = np.unique(pair[::-1], return_index=True)
+        keep = len(pair) - 1 - last
+        vertex_i, ref_i, weight = vertex_i[keep], ref_i[keep], weight[keep]
+        
+        key = ref_i * 256 + weight
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        vertex_i = vertex_i[order]
+        starts = np.flatnonzero(np.diff(key, prepend=-1))
+        ends = np.append(starts[1:], len(key))
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            batch_key = int(key[start])
+            yield batch_key >> 8, batch_key & 0xFF, vertex_i[start:end].tolist()
+
+class SanzaruMaterial:
+    def __init__(self, data):
+        self.material_name = ""
+        self.material_hash = 0
+        self.texture_hash = 0
+        self.diffuse_color = (1.0, 1.0, 1.0, 1.0)
+        self.specular_color = (0.0, 0.0, 0.0, 1.0)
+        self.wrap_modes = (PICA_WRAP_REPEAT, PICA_WRAP_REPEAT) # U, V
+        self.profile = None
+
+        # MATL - MATL Identifier 
+        matl = read_root_chunk(data, b"MATL")
+        view = matl.view
+
+        # MTLH - Material Header           
+        mtlh = matl.child(b"MTLH")
+        mtlh_version, self.texture_hash = MTLH_STRUCT.unpack_from(view, mtlh.start)
+        # 0x3C bytes of material parameters
+        params = MTLH_PARAMS_STRUCT.unpack_from(view, mtlh.start + MTLH_STRUCT.size)
+        if mtlh_params_valid(params): # Anything else keeps the defaults, textures tile like before
+            self.diffuse_color = params[0:4]
+            self.specular_color = params[4:8]
+            self.wrap_modes = params[8:10]
+        self.material_hash, material_name = MTLH_NAME_STRUCT.unpack_from(view, mtlh.start + MTLH_STRUCT.size + 0x3C)
+        self.material_name = material_name.split(b'\x00')[0].decode()
+    
+def parse_texr(data, decode=True): # Only reads the name and hash when decode is False
+    # TEXR - TEXR Identifier 
+    texr = read_root_chunk(data, b"TEXR")
+    view = texr.view
+
+    # TXRH - Material Header           
+    txrh = texr.child(b"TXRH")
+    txrh_version, tex_hash, texture_name = TXRH_STRUCT.unpack_from(view, txrh.start) # 7 unknown bytes, padding?
+    
+    # T3DS - Container for CTPK texture
+    t3ds = texr.child(b"T3DS")
+    
+    # CTPK - 3DS texture package
+    if decode:
+        with profile_stage("texture_decode", bytes=t3ds.length) as counts:
+            texture = parse_ctpk(t3ds.data())
+            counts["pixels"] = texture.width * texture.height
+    else:
+        texture = SanzaruTexture(0, 0, None)
+    texture.name = texture_name.split(b'\x00')[0].decode()
+    texture.hash = tex_hash
+    return texture
+
+class SanzaruModel: # Parsed .geo and the submeshes of one of its detail levels, waiting to be built
+    def __init__(self, geo, source_path, lod=0):
+        self.geo = geo
+        self.source_path = source_path # Folder or archive the model was read from
+        self.lod = lod # Index into geo.lods
+        self.submeshes = []
+        self.profile = None # Profile recorded while decoding
+
+    @property
+    def vertex_count(self):
+        return sum(submesh.vertex.count for submesh in self.submeshes)
+
+def parse_model(geo_data, source, lod=0):
+    return parse_mesh(parse_geo(geo_data), source, lod)
+
+def parse_geo(geo_data):
+    with profile_stage("geo_parse", bytes=len(geo_data)):
+        return SanzaruGEOB(geo_data)
+
+def parse_mesh(geo, source, lod=0): # Submeshes of one GLOD entry
+    model = SanzaruModel(geo, source.path, lod)
+
+    # Mesh File Identifier
+    mesh = read_root_chunk(source.open(".mes", geo.lods[lod][0]), b"MESH")
+
+    # Mesh File Header
+    mshh = mesh.child(b"MSHH")
+    mshh_version, *unknown, mesh_hash = MSHH_STRUCT.unpack_from(mesh.view, mshh.start) # 4 Unknown floats
+    
+    # Submesh count comes from the chunk table, there is no count field in the header
+    for i, smsh in enumerate(mesh.find_all(b"SMSH")):
+        submesh_start = time.perf_counter()
+        submesh = SanzaruSubmesh(smsh, model.geo)
+        model.submeshes.append(submesh)
+        profile_submesh(model.geo, i, submesh, lod=lod, decode_seconds=time.perf_counter() - submesh_start)
+    return model
+
+# Detail level selection, identifiers match the importer's LOD mode
+LOD_MODES = ("HIGHEST", "LOWEST", "ALL", "DISTANCE")
+
+def select_lods(geo, mode="HIGHEST", camera=None, distance_scale=1.0): # GLOD indices to import
+    if mode == "LOWEST":
+        return [len(geo.lods) - 1]
+    if mode == "ALL":
+        return list(range(len(geo.lods)))
+    if mode == "DISTANCE": # Switch distance is where a level takes over, camera is in model space
+        center = (np.float32(geo.bounds_min) + np.float32(geo.bounds_max)) / 2
+        distance = float(np.linalg.norm(center - np.float32(camera))) * distance_scale
+        reached = [i for i, (mesh_hash, switch_distance) in enumerate(geo.lods) if switch_distance <= distance]
+        if not reached:
+            return [0]
+        return [max(reached, key=lambda i: geo.lods[i][1])]
+    return [0]
+
+# Chunks whose payload is a list of further chunks
+CONTAINER_CHUNKS = {b"GEOB", b"SKEL", b"MESH", b"SMSH", b"MATL", b"TEXR"}
+
+CHUNK_HEADER = struct.Struct("<4sI")
+HASH_STRUCT = struct.Struct("<i")
+FLOAT_STRUCT = struct.Struct("<f")
+GEOH_STRUCT = struct.Struct("<B6fiiI") # version, bounding box min/max, name hash, anim hash, light group
+SKHD_STRUCT = struct.Struct("<Bh") # version, bone count
+BONE_STRUCT = struct.Struct("<ii9f32s") # name hash, parent hash, x basis, z basis, position, name
+GLOD_STRUCT = struct.Struct("<Bif") # version, mesh hash, switch distance
+MSHH_STRUCT = struct.Struct("<B4fi") # version, 4 unknown floats, mesh hash
+MHDR_STRUCT = struct.Struct("<BHHBii") # version, vertex count, index count, primitive type, material hash, vertex def hash
+PACK_BUF_STRUCT = struct.Struct("<II") # offset, size
+MTLH_STRUCT = struct.Struct("<Bi") # version, texture hash
+# Inferred layout, not confirmed against the game: diffuse color, specular color, unknown, U/V wrap mode
+MTLH_PARAMS_STRUCT = struct.Struct("<4f4f20xII")
+MTLH_NAME_STRUCT = struct.Struct("<i32s") # material hash, name
+
+# PICA200 texture wrap modes
+PICA_WRAP_CLAMP_TO_EDGE = 0
+PICA_WRAP_CLAMP_TO_BORDER = 1
+PICA_WRAP_REPEAT = 2
+PICA_WRAP_MIRRORED_REPEAT = 3
+TXRH_STRUCT = struct.Struct("<Bi7x32s") # version, texture hash, name
+
+class Chunk:
+    def __init__(self, view, offset):
+        self.view = view
+        self.offset = offset
+        self.type, self.length = CHUNK_HEADER.unpack_from(view, offset)
+        self.start = offset + 8 # Payload start
+        self.end = offset + 4 + self.length # Length counts itself
+        self.children = []
+
+    def find(self, chunk_type):
+        for child in self.children:
+            if child.type == chunk_type:
+                return child
+        return None
+
+    def find_all(self, chunk_type):
+        return [child for child in self.children if child.type == chunk_type]
+
+    def child(self, chunk_type):
+        child = self.find(chunk_type)
+        if child is None:
+            raise ValueError(f"Missing {chunk_type.decode()} chunk in {self.type.decode()} chunk at {hex_offset(self.offset)}")
+        return child
+
+    def data(self):
+        return self.view[self.start:self.end]
+
+    def check_size(self, size):
+        if self.start + size > self.end:
+            raise ValueError(f"Unexpected end of {self.type.decode()} chunk at {hex_offset(self.offset)}")
+
+    def array(self, dtype, count): # Zero-copy view of count elements at the start of the payload
+        self.check_size(dtype.itemsize * count)
+        return np.frombuffer(self.view, dtype, count, self.start)
+
+def read_chunks(view, start, end): # Walk the chunk tree once, recording offsets and children
+    chunks = []
+    offset = start
+    while offset + 8 <= end:
+        chunk = Chunk(view, offset)
+        if chunk.end > end:
+            invalid_format(chunk.type.decode(errors="replace"), offset, b"")
+        if chunk.type in CONTAINER_CHUNKS:
+            chunk.children = read_chunks(view, chunk.start, chunk.end)
+        chunks.append(chunk)
+        offset = next_chunk(view, chunk, end)
+    return chunks
+
+def next_chunk(view, chunk, end): # Padded payloads (MSHH, MIDX) are rounded up to 4 bytes, others are followed directly
+    # Padding is relative to the payload, chunks themselves can start unaligned after an odd sized MHDR
+    offset = chunk.end
+    for candidate in (offset, offset + (-(offset - chunk.start) % 4)):
+        if candidate + 8 <= end and is_fourcc(view[candidate:candidate + 4]):
+            return candidate
+    return end # Trailing padding or unknown data
+
+def is_fourcc(magic):
+    return all(0x30 <= c <= 0x39 or 0x41 <= c <= 0x5A for c in magic)
+
+def read_root_chunk(data, chunk_type):
+    view = memoryview(data).cast("B")
+    magic = bytes(view[0:4])
+    if magic != chunk_type:
+        invalid_format(chunk_type.decode(), 0, magic)
+    return read_chunks(view, 0, len(view))[0]
+
+def hash_buffers(buffers):
+    digest = hashlib.blake2b(digest_size=16)
+    for buffer in buffers:
+        digest.update(buffer)
+    return digest.hexdigest()
+
+def chunk_buffers(chunk): # Headers are included so payload boundaries count
+    return [CHUNK_HEADER.pack(chunk.type, chunk.length), chunk.data()]
+
+def mtlh_params_valid(params): # Whether the guessed MTLH layout fits: 0-1 colors (NaN fails too) and known wrap modes
+    colors, wrap_modes = params[0:8], params[8:10]
+    if not any(params[0:4]): # Zeroed block, a zero wrap mode here would clamp textures that should tile
+        return False
+    return all(0.0 <= value <= 1.0 for value in colors) and all(
+        PICA_WRAP_CLAMP_TO_EDGE <= mode <= PICA_WRAP_MIRRORED_REPEAT for mode in wrap_modes)
+
+def packed_stream(smsh, offset, size, *expected_sizes): # Payload of a packed buffer declared in MHDR
+    # None when absent, outside the SMSH chunk or not one of the expected sizes, so the caller can fall back to MVTX/MIDX
+    start = smsh.offset + offset
+    if not size or size not in expected_sizes or offset < 8 or start + size > smsh.end:
+        return None
+    return smsh.view[start:start + size]
+
+def read_string(view, offset, size):
+    return bytes(view[offset:offset + size]).split(b'\x00')[0].decode()
+
+def hex_offset(loc):
+    return hex(loc)[:2] + hex(loc)[2:].upper() # For nicer readable hex offsets
+
+def invalid_format(txt, loc, value):
+    loc_hex = hex_offset(loc)
+    wrong_data = f"Unexpected magic bytes; expected {txt} chunk at {loc_hex}, actual value {value}"
+    eof = "Unexpected end of file"
+    if not value:
+        raise ValueError(eof)
+    else:
+        raise ValueError(wrong_data)
+
+# Offset of the identifying hash in each asset type
+ASSET_HASH_OFFSETS = {
+    ".mes": 0x21, # MSHH mesh hash
+    ".mat": 0x51, # MTLH material hash
+    ".tex": 0x11, # TXRH texture hash
+}
+ASSET_INDEX_NAME = "sanzaru_index.json"
+ASSET_INDEX_VERSION = 1
+
+class AssetIndex: # Hash -> file lookup for an extracted folder, persisted next to the assets
+    _loaded = {} # Indices already built this session, keyed by folder
+
+    def __init__(self, folder):
+        self.folder = os.path.abspath(folder)
+        self.path = self.folder
+        self.dir_mtime = 0
+        self.files = {} # Filename -> (size, hash)
+        self.hashes = {suffix: {} for suffix in ASSET_HASH_OFFSETS} # Suffix -> {hash: filename}
+
+    @classmethod
+    def get(cls, folder):
+        folder = os.path.abspath(folder)
+        index = cls._loaded.get(folder)
+        if index is None:
+            index = cls(folder)
+            index.load()
+            cls._loaded[folder] = index
+        elif os.stat(folder).st_mtime_ns != index.dir_mtime: # Files added or removed since last import
+            index.refresh()
+        return index
+
+    def load(self):
+        cache_path = os.path.join(self.folder, ASSET_INDEX_NAME)
+        try:
+            with open(cache_path, "r") as cache_file:
+                cache = json.load(cache_file)
+            if cache["version"] == ASSET_INDEX_VERSION:
+                self.dir_mtime = cache["dir_mtime"]
+                self.files = {name: tuple(entry) for name, entry in cache["files"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.dir_mtime = 0
+            self.files = {}
+        
+        if os.stat(self.folder).st_mtime_ns != self.dir_mtime:
+            self.refresh()
+        else:
+            self.build_lookup()
+
+    def refresh(self): # Rescan folder, only reading hashes of new or resized files
+        with profile_stage("index_scan"):
+            self.scan()
+
+    def scan(self):
+        self.dir_mtime = os.stat(self.folder).st_mtime_ns
+        files = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                suffix = os.path.splitext(entry.name)[1]
+                if suffix not in ASSET_HASH_OFFSETS or not entry.is_file():
+                    continue
+                size = entry.stat().st_size
+                cached = self.files.get(entry.name)
+                if cached and cached[0] == size:
+                    files[entry.name] = cached
+                    continue
+                file_hash = read_asset_hash(entry.path, ASSET_HASH_OFFSETS[suffix])
+                if file_hash is not None:
+                    files[entry.name] = (size, file_hash)
+        self.files = files
+        self.build_lookup()
+        self.save()
+
+    def build_lookup(self):
+        self.hashes = {suffix: {} for suffix in ASSET_HASH_OFFSETS}
+        for name, (size, file_hash) in self.files.items():
+            self.hashes[os.path.splitext(name)[1]][file_hash] = name
+
+    def save(self):
+        cache_path = os.path.join(self.folder, ASSET_INDEX_NAME)
+        try:
+            if not os.path.exists(cache_path):
+                open(cache_path, "a").close() # Creating the cache touches the folder, so do it before taking the mtime
+            self.dir_mtime = os.stat(self.folder).st_mtime_ns
+            cache = {
+                "version": ASSET_INDEX_VERSION,
+                "dir_mtime": self.dir_mtime,
+                "files": self.files,
+            }
+            with open(cache_path, "w") as cache_file:
+                json.dump(cache, cache_file)
+        except OSError:
+            pass # Read-only folder, keep the index in memory only
+
+    def find(self, suffix, target_hash):
+        name = self.hashes[suffix].get(target_hash)
+        if name is not None:
+            path = os.path.join(self.folder, name)
+            try:
+                if os.path.getsize(path) == self.files[name][0]:
+                    return path
+            except OSError:
+                pass
+        self.refresh() # Stale entry or missing hash, rescan once before giving up
+        name = self.hashes[suffix].get(target_hash)
+        if name is None:
+            raise ValueError(f"Could not find associated {suffix} file")
+        return os.path.join(self.folder, name)
+
+    def open(self, suffix, target_hash):
+        with profile_stage("find_file") as counts:
+            data = map_file(self.find(suffix, target_hash))
+            counts["bytes"] = len(data)
+        return data
+
+    def file_stamp(self, suffix, target_hash):
+        stat = os.stat(self.find(suffix, target_hash))
+        return stat.st_size, stat.st_mtime_ns
+
+    def read_offset(self, suffix, target_hash): # Separate files have no shared read order
+        return 0
+
+    def geo_keys(self):
+        return sorted(name for name in os.listdir(self.folder) if name.lower().endswith(".geo"))
+
+    def read_geo(self, name):
+        return map_file(os.path.join(self.folder, name))
+
+def map_file(path): # Read-only view of a whole file, parsers read it in place instead of copying it
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0: # Empty files cannot be mapped
+            return memoryview(b"")
+        return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+def read_asset_hash(path, offset):
+    with open(path, "rb") as file:
+        file.seek(offset)
+        data = file.read(4)
+    if len(data) < 4:
+        return None
+    return struct.unpack("<i", data)[0]
+
+def find_file(folder, suffix, target_hash): # Find desired file based on hash
+    return AssetIndex.get(folder).open(suffix, target_hash)
+
+# Chunk types extracted from sancooked archives, named by the extension QuickBMS guesses for them
+ARCHIVE_CHUNK_TYPES = {
+    b"GEOB": ".geo",
+    b"MESH": ".mes",
+    b"MATL": ".mat",
+    b"TEXR": ".tex",
+}
+
+class ArchiveEntry:
+    def __init__(self, chunk_type, offset, size, name):
+        self.type = chunk_type
+        self.offset = offset
+        self.size = size # Whole chunk including its 8 byte header, same as the extracted file
+        self.name = name
+
+class SanzaruArchive: # Sancooked archive reader, mirrors sancooked-sonic.bms
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self.hashes = {suffix: {} for suffix in ASSET_HASH_OFFSETS} # Suffix -> {hash: entry}
+        
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            stat = os.fstat(file.fileno())
+        self.stamp = (stat.st_size, stat.st_mtime_ns)
+        self.view = memoryview(self.map)
+        self.read_directory()
+
+    def read_directory(self):
+        view = self.view
+        file_size = len(view)
+        chunk_count = struct.unpack_from("<I", view, 0x20)[0]
+        offset = 0x28
+        
+        for _ in range(chunk_count):
+            if offset >= file_size:
+                break
+            chunk_type, chunk_length = struct.unpack_from("<4sI", view, offset)
+            chunk_end = offset + chunk_length + 4
+            switch = struct.unpack_from("<I", view, offset + 8)[0]
+            
+            if switch == 1: # Named standalone chunk
+                name = bytes(view[offset + 0xC:offset + 0x2C]).split(b'\x00')[0].decode()
+                self.add_entry(ArchiveEntry(chunk_type, offset, chunk_length + 4, name))
+            else: # Container of sub chunks
+                sub_offset = offset + 8
+                k = 0
+                while sub_offset < chunk_end:
+                    sub_type, sub_length = struct.unpack_from("<4sI", view, sub_offset)
+                    name = f"{sub_type.decode(errors='replace')}_{k}"
+                    self.add_entry(ArchiveEntry(sub_type, sub_offset, sub_length + 4, name))
+                    sub_offset += sub_length + 4
+                    k += 1
+            offset = chunk_end
+
+    def add_entry(self, entry):
+        self.entries.append(entry)
+        suffix = ARCHIVE_CHUNK_TYPES.get(entry.type)
+        if suffix in ASSET_HASH_OFFSETS:
+            hash_offset = ASSET_HASH_OFFSETS[suffix]
+            if entry.size >= hash_offset + 4:
+                file_hash = struct.unpack_from("<i", self.view, entry.offset + hash_offset)[0]
+                self.hashes[suffix][file_hash] = entry
+
+    def entries_of(self, suffix):
+        return [entry for entry in self.entries if ARCHIVE_CHUNK_TYPES.get(entry.type) == suffix]
+
+    def data(self, entry):
+        return self.view[entry.offset:entry.offset + entry.size]
+
+    def geo_keys(self): # Entry indices, stable across processes opening the same archive
+        return [i for i, entry in enumerate(self.entries) if ARCHIVE_CHUNK_TYPES.get(entry.type) == ".geo"]
+
+    def read_geo(self, key):
+        return self.data(self.entries[key])
+
+    def open(self, suffix, target_hash):
+        entry = self.hashes[suffix].get(target_hash)
+        if entry is None:
+            raise ValueError(f"Could not find associated {suffix} chunk in {os.path.basename(self.path)}")
+        profile_count("find_file", bytes=entry.size)
+        return self.data(entry)
+
+    def file_stamp(self, suffix, target_hash): # Entries change with the archive
+        return self.stamp
+
+    def read_offset(self, suffix, target_hash): # Jobs sorted by this read the archive front to back
+        entry = self.hashes[suffix].get(target_hash)
+        return entry.offset if entry is not None else 0
+
+    def close(self):
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            pass # Decoded arrays still reference the mapping, it is freed with them
+
+# PICA200 texture formats used in CTPK, format id -> bits per pixel
+PICA_FORMATS = {
+    0x0: ("RGBA8", 32),
+    0x1: ("RGB8", 24),
+    0x2: ("RGBA5551", 16),
+    0x3: ("RGB565", 16),
+    0x4: ("RGBA4", 16),
+    0x5: ("LA8", 16),
+    0x6: ("HILO8", 16),
+    0x7: ("L8", 8),
+    0x8: ("A8", 8),
+    0x9: ("LA4", 8),
+    0xA: ("L4", 4),
+    0xB: ("A4", 4),
+    0xC: ("ETC1", 4),
+    0xD: ("ETC1A4", 8),
+}
+
+PICA_FORMAT_BPP = {fmt_name: bpp for fmt_name, bpp in PICA_FORMATS.values()}
+
+ETC1_MODIFIERS = np.array((
+    (2, 8), (5, 17), (9, 29), (13, 42),
+    (18, 60), (24, 80), (33, 106), (47, 183),
+), np.int16)
+
+def morton_table(): # [y, x] -> pixel index inside an 8x8 tile, x in even bits and y in odd bits
+    xs = np.arange(8)
+    spread = (xs & 1) | ((xs & 2) << 1) | ((xs & 4) << 2)
+    return spread[np.newaxis, :] | (spread[:, np.newaxis] << 1)
+
+MORTON_TABLE = morton_table()
+
+class SanzaruTexture:
+    def __init__(self, width, height, pixels):
+        self.name = ""
+        self.hash = 0
+        self.width = width
+        self.height = height
+        self.pixels = pixels # (height, width, 4) float32 RGBA, bottom row first like Blender
+        self.profile = None
+
+def parse_ctpk(data): # First texture of a CTPK container, mip 0 only
+    data = memoryview(data)
+    magic, version, tex_count, tex_offset = struct.unpack_from("<4sHHI", data, 0)
+    if magic != b"CTPK":
+        invalid_format("CTPK", 0, magic)
+    if not tex_count:
+        raise ValueError("CTPK contains no textures")
+    
+    # Texture info entries follow the 0x20 byte header
+    name_offset, data_size, data_offset, fmt, width, height = struct.unpack_from("<IIIIHH", data, 0x20)
+    if fmt not in PICA_FORMATS:
+        raise ValueError(f"Unsupported CTPK texture format {hex(fmt)}")
+    size = width * height * PICA_FORMATS[fmt][1] // 8
+    start = tex_offset + data_offset
+    pixels = decode_pica_texture(data[start:start + size], width, height, fmt)
+    return SanzaruTexture(width, height, pixels)
+
+def decode_pica_texture(data, width, height, fmt):
+    fmt_name, bpp = PICA_FORMATS[fmt]
+    size = width * height * bpp // 8
+    if len(data) < size:
+        raise ValueError("Unexpected end of texture data")
+    data = np.frombuffer(data, np.uint8, size)
+    
+    if fmt_name in ("ETC1", "ETC1A4"):
+        return decode_etc1(data, width, height, fmt_name == "ETC1A4")
+    
+    rgba = decode_pixels(data, fmt_name) # Tiled 8x8, Morton order inside each tile
+    tiles = rgba.reshape(-1, 64, 4)[:, MORTON_TABLE] # -> (tile, y, x, rgba)
+    tiles = tiles.reshape(height // 8, width // 8, 8, 8, 4).transpose(0, 2, 1, 3, 4)
+    return tiles.reshape(height, width, 4).astype(np.float32) / 255
+
+def decode_pixels(data, fmt_name): # Raw texels -> (pixel, rgba) uint8
+    if fmt_name in ("L4", "A4"): # Two pixels per byte, low nibble first
+        data = np.stack((data & 0xF, data >> 4), axis=-1).ravel() * np.uint8(0x11)
+        count = len(data)
+    else:
+        count = len(data) * 8 // PICA_FORMAT_BPP[fmt_name]
+    rgba = np.full((count, 4), 255, np.uint8)
+    
+    if fmt_name == "RGBA8": # Stored ABGR
+        rgba[:] = data.reshape(-1, 4)[:, ::-1]
+    elif fmt_name == "RGB8": # Stored BGR
+        rgba[:, :3] = data.reshape(-1, 3)[:, ::-1]
+    elif fmt_name in ("RGBA5551", "RGB565", "RGBA4"):
+        value = data.view("<u2").astype(np.uint16)
+        if fmt_name == "RGBA5551":
+            rgba[:, 0] = expand_bits(value >> 11, 5)
+            rgba[:, 1] = expand_bits(value >> 6, 5)
+            rgba[:, 2] = expand_bits(value >> 1, 5)
+            rgba[:, 3] = (value & 1) * 255
+        elif fmt_name == "RGB565":
+            rgba[:, 0] = expand_bits(value >> 11, 5)
+            rgba[:, 1] = expand_bits(value >> 5, 6)
+            rgba[:, 2] = expand_bits(value, 5)
+        else:
+            rgba[:, 0] = expand_bits(value >> 12, 4)
+            rgba[:, 1] = expand_bits(value >> 8, 4)
+            rgba[:, 2] = expand_bits(value >> 4, 4)
+            rgba[:, 3] = expand_bits(value, 4)
+    elif fmt_name == "LA8": # Stored AL
+        pairs = data.reshape(-1, 2)
+        rgba[:, :3] = pairs[:, 1:2]
+        rgba[:, 3] = pairs[:, 0]
+    elif fmt_name == "HILO8": # Normal map X/Y, stored YX
+        pairs = data.reshape(-1, 2)
+        rgba[:, 0] = pairs[:, 1]
+        rgba[:, 1] = pairs[:, 0]
+        rgba[:, 2] = 0
+    elif fmt_name in ("L8", "L4"):
+        rgba[:, :3] = data[:, np.newaxis]
+    elif fmt_name in ("A8", "A4"):
+        rgba[:, :3] = 255
+        rgba[:, 3] = data
+    elif fmt_name == "LA4": # Luminance high nibble, alpha low nibble
+        rgba[:, :3] = ((data >> 4) * 0x11)[:, np.newaxis]
+        rgba[:, 3] = (data & 0xF) * 0x11
+    return rgba
+
+def expand_bits(value, bits): # Scale an n bit channel to 8 bits
+    value = value.astype(np.uint16) & ((1 << bits) - 1)
+    return ((value << (8 - bits)) | (value >> (2 * bits - 8))).astype(np.uint8)
+
+def decode_etc1(data, width, height, has_alpha):
+    # 8x8 tiles of four 4x4 blocks in Z order, each block a little endian 64-bit ETC1 word (ETC1A4 prefixes 64-bit alpha)
+    blocks = data.view("<u8").astype(np.uint64)
+    if has_alpha:
+        alpha, color = blocks[0::2], blocks[1::2]
+    else:
+        alpha, color = None, blocks
+    block_count = len(color)
+    
+    high = (color >> np.uint64(32)).astype(np.int64)
+    low = (color & np.uint64(0xFFFFFFFF)).astype(np.int64)
+    flip = (high & 1).astype(bool)
+    diff = (high & 2).astype(bool)
+    
+    # Base colors, (block, subblock, rgb)
+    base = np.empty((block_count, 2, 3), np.int16)
+    for channel, shift in enumerate((24, 16, 8)):
+        individual1 = ((high >> (shift + 4)) & 0xF) * 0x11
+        individual2 = ((high >> shift) & 0xF) * 0x11
+        diff1 = (high >> (shift + 3)) & 0x1F
+        delta = ((high >> shift) & 0x7) - (((high >> shift) & 0x4) << 1) # 3 bit two's complement
+        diff2 = (diff1 + delta) & 0x1F
+        base[:, 0, channel] = np.where(diff, (diff1 << 3) | (diff1 >> 2), individual1)
+        base[:, 1, channel] = np.where(diff, (diff2 << 3) | (diff2 >> 2), individual2)
+    tables = np.stack(((high >> 5) & 7, (high >> 2) & 7), axis=1) # (block, subblock)
+    
+    # Per pixel data, pixel i = x * 4 + y within the block
+    pixel = np.arange(16)
+    pixel_x, pixel_y = pixel // 4, pixel % 4
+    lsb = (low[:, np.newaxis] >> pixel) & 1
+    msb = (low[:, np.newaxis] >> (pixel + 16)) & 1
+    index = (msb << 1) | lsb # 0: +a, 1: +b, 2: -a, 3: -b
+    subblock = np.where(flip[:, np.newaxis], pixel_y >= 2, pixel_x >= 2).astype(np.intp)
+    
+    block_i = np.arange(block_count)[:, np.newaxis]
+    table = tables[block_i, subblock]
+    modifier = ETC1_MODIFIERS[table, index & 1]
+    modifier = np.where(index & 2, -modifier, modifier)
+    rgb = np.clip(base[block_i, subblock] + modifier[..., np.newaxis], 0, 255).astype(np.uint8)
+    
+    pixels = np.empty((block_count, 16, 4), np.uint8)
+    pixels[..., :3] = rgb
+    if has_alpha:
+        nibbles = (alpha[:, np.newaxis] >> (pixel.astype(np.uint64) * np.uint64(4))) & np.uint64(0xF)
+        pixels[..., 3] = nibbles.astype(np.uint8) * 0x11
+    else:
+        pixels[..., 3] = 255
+    
+    # (tile_y, tile_x, block_y, block_x, x, y, rgba) -> (tile_y, block_y, y, tile_x, block_x, x, rgba)
+    pixels = pixels.reshape(height // 8, width // 8, 2, 2, 4, 4, 4).transpose(0, 2, 5, 1, 3, 4, 6)
+    return pixels.reshape(height, width, 4).astype(np.float32) / 255
+
+
+TEXTURE_CACHE_LIMIT = 512 * 1024 * 1024
+
+def texture_cache_folder():
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "sanzaru", "textures")
+
+class TextureCache: # Decoded mip 0 as uint8 .npy files, least recently used files are evicted past the size limit
+    # Stores don't evict, the caller runs evict once after a batch instead of rescanning the folder per texture
+    def __init__(self, folder=None, limit=TEXTURE_CACHE_LIMIT):
+        self.folder = folder or texture_cache_folder()
+        self.limit = limit
+
+    def path(self, texture_hash, stamp): # Keyed by TXRH hash plus size and mtime of the source file
+        size, mtime = stamp
+        return os.path.join(self.folder, f"{texture_hash & 0xFFFFFFFF:08x}_{size:x}_{mtime:x}.npy")
+
+    def lookup(self, data, stamp): # Cached texture, or None when it still has to be decoded
+        texture = parse_texr(data, decode=False)
+        path = self.path(texture.hash, stamp)
+        try:
+            with profile_stage("texture_cache_load") as counts:
+                pixels = np.load(path)
+                os.utime(path) # Mark as recently used
+                counts["bytes"] = pixels.nbytes
+        except (OSError, ValueError):
+            return None
+        texture.height, texture.width = pixels.shape[:2]
+        texture.pixels = pixels.astype(np.float32) / 255
+        return texture
+
+    def store(self, texture, stamp):
+        path = self.path(texture.hash, stamp)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            with profile_stage("texture_cache_store"), open(temp_path, "wb") as file:
+                np.save(file, np.rint(texture.pixels * 255).astype(np.uint8))
+            os.replace(temp_path, path) # Workers may store the same texture at once
+        except OSError:
+            return # Unwritable cache folder, textures are just decoded every time
+
+    def decode(self, data, stamp):
+        texture = self.lookup(data, stamp)
+        if texture is None:
+            texture = parse_texr(data)
+            self.store(texture, stamp)
+        return texture
+
+    def evict(self):
+        files = []
+        total_size = 0
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".npy"):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                        total_size += stat.st_size
+        except OSError:
+            return # Nothing was ever stored
+        files.sort()
+        for mtime, size, path in files:
+            if total_size <= self.limit:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError:
+                pass
+
+_open_sources = {} # Path -> AssetIndex or SanzaruArchive, per process
+
+def open_source(path): # Folder of extracted files or sancooked archive
+    path = os.path.abspath(path)
+    source = _open_sources.get(path)
+    if source is None:
+        if os.path.isdir(path):
+            source = AssetIndex.get(path)
+        else:
+            source = SanzaruArchive(path)
+        _open_sources[path] = source
+    return source
+
+def close_sources():
+    for source in _open_sources.values():
+        if isinstance(source, SanzaruArchive):
+            source.close()
+    _open_sources.clear()
+
+# Profiling, stages record into the profile of the decode job running in this process
+_profile = None
+
+class Profile: # Wall time, call count and element counts per stage, plus one row per submesh
+    def __init__(self):
+        self.stages = {} # Stage -> {"seconds", "calls", counts...}
+        self.submeshes = []
+
+    def add(self, stage, seconds, calls=1, **counts):
+        entry = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+        entry["seconds"] += seconds
+        entry["calls"] += calls
+        for key, value in counts.items():
+            entry[key] = entry.get(key, 0) + value
+
+    @contextlib.contextmanager
+    def stage(self, stage, **counts): # Counts can also be filled in through the yielded dict
+        start_time = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            self.add(stage, time.perf_counter() - start_time, **counts)
+
+    def merge(self, other):
+        if other is None:
+            return
+        for stage, entry in other.stages.items():
+            entry = dict(entry)
+            self.add(stage, entry.pop("seconds"), entry.pop("calls"), **entry)
+        self.submeshes.extend(other.submeshes)
+
+    @contextlib.contextmanager
+    def capture(self): # Make this the profile core functions record into
+        global _profile
+        previous = _profile
+        _profile = self
+        try:
+            yield self
+        finally:
+            _profile = previous
+
+    def report_lines(self):
+        lines = []
+        for stage, entry in sorted(self.stages.items(), key=lambda item: -item[1]["seconds"]):
+            counts = "".join(f", {value} {key}" for key, value in entry.items() if key not in ("seconds", "calls"))
+            lines.append(f"{stage}: {entry['seconds'] * 1000:.1f} ms, {entry['calls']} calls{counts}")
+        return lines
+
+    def save(self, path, **info):
+        report = {"version": 1, **info, "stages": self.stages, "submeshes": self.submeshes}
+        with open(path, "w") as file:
+            json.dump(report, file, indent=1)
+
+def profile_stage(stage, **counts):
+    if _profile is None:
+        return contextlib.nullcontext(counts)
+    return _profile.stage(stage, **counts)
+
+def profile_count(stage, **counts): # Counts without timing, for stages too small to time
+    if _profile is not None:
+        _profile.add(stage, 0.0, **counts)
+
+def profile_submesh(geo, index, submesh, **values):
+    if _profile is not None:
+        influences = int(np.count_nonzero(submesh.vertex.weight)) if submesh.get_weights else 0
+        _profile.submeshes.append({
+            "model": geo.name,
+            "submesh": index,
+            "vertices": submesh.vertex.count,
+            "faces": submesh.face.count,
+            "influences": influences,
+            "bones": len(submesh.weight.pal),
+            **values,
+        })
+
+# Process pool entry points, jobs are plain paths and hashes so they pickle cheaply
+# Each result carries the profile recorded while decoding it
+def decode_model(source_path, geo_key, lod_mode="HIGHEST", camera=None, distance_scale=1.0): # One model per selected LOD
+    with Profile().capture() as profile:
+        source = open_source(source_path)
+        geo = parse_geo(source.read_geo(geo_key))
+    
+    models = []
+    for lod in select_lods(geo, lod_mode, camera, distance_scale):
+        with Profile().capture() as lod_profile:
+            model = parse_mesh(geo, source, lod)
+        model.profile = lod_profile
+        models.append(model)
+    models[0].profile.merge(profile) # .geo parsing is counted once
+    return models
+
+def decode_material(source_path, material_hash):
+    with Profile().capture() as profile:
+        with profile_stage("material_parse"):
+            mat = SanzaruMaterial(open_source(source_path).open(".mat", material_hash))
+    mat.profile = profile
+    return mat
+
+def decode_texture(source_path, texture_hash, cache_folder=None):
+    with Profile().capture() as profile:
+        source = open_source(source_path)
+        data = source.open(".tex", texture_hash)
+        if cache_folder is None:
+            texture = parse_texr(data)
+        else:
+            texture = TextureCache(cache_folder).decode(data, source.file_stamp(".tex", texture_hash))
+    texture.profile = profile
+    return texture
+
+class DecodePool: # Runs decode jobs on worker processes, or inline when there is nothing to gain
+    def __init__(self, workers=0):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+    def map(self, function, jobs):
+        if self.workers <= 1 or len(jobs) <= 1:
+            return [function(*job) for job in jobs]
+        if self.executor is None:
+            context = multiprocessing.get_context("spawn") # Never fork a running Blender
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=context)
+        chunksize = max(1, len(jobs) // (self.workers * 4))
+        try:
+            return list(self.executor.map(function, *zip(*jobs), chunksize=chunksize))
+        except BrokenProcessPool: # Workers could not start in this environment, decode in this process instead
+            print("Worker processes unavailable, decoding in the main process")
+            self.close()
+            self.workers = 1
+            return [function(*job) for job in jobs]
+
+    def map_steps(self, function, jobs): # Generator version of map, yields the finished fraction while jobs run
+        if self.workers <= 1 or len(jobs) <= 1:
+            results = []
+            for job in jobs:
+                results.append(function(*job))
+                yield len(results) / len(jobs)
+            return results
+        if self.executor is None:
+            context = multiprocessing.get_context("spawn") # Never fork a running Blender
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=context)
+        try:
+            futures = [self.executor.submit(function, *job) for job in jobs]
+            pending = futures
+            while pending:
+                done, pending = wait(pending, timeout=0.01)
+                yield 1 - len(pending) / len(futures)
+            return [future.result() for future in futures]
+        except BrokenProcessPool: # Workers could not start in this environment, decode in this process instead
+            print("Worker processes unavailable, decoding in the main process")
+            self.close()
+            self.workers = 1
+            return (yield from self.map_steps(function, jobs))
+
+    def close(self, cancel=False):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=cancel)
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close(cancel=exc_info[0] is not None) # Queued jobs are dropped when the import failed or was cancelled
+
+def run_steps(steps): # Run a step generator to the end and return its result
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
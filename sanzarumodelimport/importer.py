@@ -0,0 +1,911 @@
+import bpy
+import mathutils
+import os
+import math
+import time
+import hashlib
+import fnmatch
+import cProfile
+import pstats
+import numpy as np
+from bpy_extras.io_utils import ImportHelper
+from bpy.props import StringProperty, BoolProperty, IntProperty, FloatProperty, EnumProperty, CollectionProperty
+from bpy.types import Operator
+from bpy.app.handlers import persistent
+
+from .core import (
+    PICA_WRAP_CLAMP_TO_BORDER,
+    PICA_WRAP_CLAMP_TO_EDGE,
+    PICA_WRAP_MIRRORED_REPEAT,
+    PICA_WRAP_REPEAT,
+    DecodePool,
+    Profile,
+    SanzaruGEOB,
+    TextureCache,
+    close_sources,
+    decode_material,
+    decode_model,
+    decode_texture,
+    open_source,
+    profile_stage,
+    run_steps,
+    select_lods,
+)
+
+IMPORT_TIME_SLICE = 0.05 # Seconds of work per timer tick during a background import
+
+# PICA200 wrap mode -> image node extension
+WRAP_EXTENSIONS = {
+    PICA_WRAP_CLAMP_TO_EDGE: 'EXTEND',
+    PICA_WRAP_CLAMP_TO_BORDER: 'CLIP',
+    PICA_WRAP_REPEAT: 'REPEAT',
+    PICA_WRAP_MIRRORED_REPEAT: 'MIRROR',
+}
+TEXTURE_NODE_NAME = "Sanzaru Texture"
+
+
+def make_skel(geo, collection):
+    name = geo.name + "_skeleton"
+    armature = bpy.data.armatures.new(name)
+    obj = bpy.data.objects.new(name, armature)
+    collection.objects.link(obj)
+
+    # Bone lengths, distance to the furthest child within an arbitrary 0.05-1.0 range
+    parents = geo.bone_parent_indices
+    positions = geo.bone_positions
+    lengths = [0.05] * geo.bone_count # Min Length
+    for i, parent in enumerate(parents):
+        if parent >= 0:
+            temp_length = float(np.linalg.norm(positions[i] - positions[parent]))
+            if 1.0 > temp_length > 0.05:
+                lengths[parent] = max(lengths[parent], temp_length)
+
+    # Bone matrices straight from BONS, the bone points along the x basis and its X axis is the z basis
+    x_basis = geo.bone_x_basis
+    z_basis = geo.bone_z_basis
+    y_basis = np.cross(z_basis, x_basis)
+
+    # Edit bones only exist in edit mode, so everything is set in one session
+    if bpy.context.object and bpy.context.object.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for selected in bpy.context.selected_objects: # Keep other armatures out of multi object edit mode
+        selected.select_set(False)
+    bpy.context.view_layer.objects.active = obj
+    obj.select_set(True)
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    edit_bones = []
+    for i in range(geo.bone_count):
+        edit_bone = armature.edit_bones.new(geo.bone_names[i])
+        edit_bone.use_connect = False
+        edit_bone.use_inherit_rotation = True
+        edit_bone.use_inherit_scale = True
+        edit_bone.use_local_location = True
+        edit_bone.head = positions[i]
+        edit_bone.tail = edit_bone.head + mathutils.Vector((0, lengths[i], 0))
+        edit_bone.matrix = mathutils.Matrix((
+            (z_basis[i][0], x_basis[i][0], y_basis[i][0], positions[i][0]),
+            (z_basis[i][1], x_basis[i][1], y_basis[i][1], positions[i][1]),
+            (z_basis[i][2], x_basis[i][2], y_basis[i][2], positions[i][2]),
+            (0, 0, 0, 1),
+        ))
+        edit_bones.append(edit_bone)
+
+    for i, parent in enumerate(parents): # Set parents
+        if parent >= 0:
+            edit_bones[i].parent = edit_bones[parent]
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+
+    return obj
+
+def submesh_name(geo, index, lod=0):
+    if lod:
+        return f"{geo.name}_LOD{lod}_submesh{str(index).zfill(2)}"
+    return f"{geo.name}_submesh{str(index).zfill(2)}"
+
+def make_mesh(submesh, geo, index, collection, skel_obj, lod=0):
+    name = submesh_name(geo, index, lod)
+
+    with profile_stage("mesh_build", vertices=submesh.vertex.count, faces=submesh.face.count):
+        me = build_mesh_data(name, submesh)
+
+    obj = link_mesh(me, name, collection)
+
+    if submesh.get_weights and skel_obj:
+        with profile_stage("weight_bind", bones=len(submesh.weight.pal)) as counts:
+            bind_weights(obj, submesh, skel_obj.pose.bones)
+            counts["influences"] = int(np.count_nonzero(submesh.vertex.weight))
+
+    if bpy.app.version < (4, 1, 0): # Custom normals always apply from 4.1 on
+        me.use_auto_smooth = True
+
+    with profile_stage("custom_normals", vertices=submesh.vertex.count):
+        me.normals_split_custom_set_from_vertices(submesh.vertex.nrm)
+        me.update()
+
+    return obj
+
+def build_mesh_data(name, submesh):
+    me = bpy.data.meshes.new(name)
+
+    # Geometry, all triangles so loops are just the flattened index buffer
+    loop_vertices = submesh.face.idx.ravel().astype(np.int32)
+    loop_count = len(loop_vertices)
+    me.vertices.add(submesh.vertex.count)
+    me.vertices.foreach_set("co", submesh.vertex.coord.ravel())
+    me.loops.add(loop_count)
+    me.loops.foreach_set("vertex_index", loop_vertices)
+    me.polygons.add(submesh.face.count)
+    me.polygons.foreach_set("loop_start", np.arange(0, loop_count, 3, dtype=np.int32))
+    if bpy.app.version < (4, 0, 0): # Polygon sizes are derived from loop_start from 4.0 on
+        me.polygons.foreach_set("loop_total", np.full(submesh.face.count, 3, dtype=np.int32))
+
+    # Per vertex attributes gathered to face corners
+    uv_layer = me.uv_layers.new(name="UVMap")
+    uv_layer.data.foreach_set("uv", submesh.vertex.uv[loop_vertices].ravel())
+    color_layer = me.color_attributes.new("Color", 'BYTE_COLOR', 'CORNER')
+    color_layer.data.foreach_set("color_srgb", submesh.vertex.color[loop_vertices].ravel())
+
+    me.validate(clean_customdata=False) # Drops degenerate/duplicate faces bmesh used to reject
+    me.update()
+    return me
+
+def link_mesh(me, name, collection):
+    # Add the mesh to the scene
+    obj = bpy.data.objects.new(name, me)
+    collection.objects.link(obj)
+
+    # Select and make active
+    bpy.context.view_layer.objects.active = obj
+    obj.select_set(True)
+    return obj
+
+def mesh_key(submesh, skel_obj): # Vertex group names live on the mesh, so the bones they map to are part of the key
+    key = hashlib.blake2b(submesh.content_hash.encode(), digest_size=16)
+    key.update(str(submesh.material_hash).encode())
+    if submesh.get_weights and skel_obj:
+        bones = skel_obj.pose.bones
+        for i in submesh.weight.pal.tolist():
+            key.update(b"\0" + bones[i].name.encode())
+    return key.hexdigest()
+
+def shared_meshes(): # Meshes left by earlier imports can be linked again
+    meshes = {}
+    for me in bpy.data.meshes:
+        key = me.get("sanzaru_mesh_key")
+        if key and not me.library:
+            meshes.setdefault(key, me)
+    return meshes
+
+def tagged(datablocks, key): # Datablocks created by earlier imports, by the hash they were tagged with
+    found = {}
+    for datablock in datablocks:
+        if key in datablock and not datablock.library:
+            found.setdefault(datablock[key], datablock)
+    return found
+
+def imported_models(): # (source, geo key) -> model collection from earlier imports
+    models = {}
+    for collection in bpy.data.collections:
+        if "sanzaru_geo" in collection and not collection.library:
+            models.setdefault((collection["sanzaru_source"], collection["sanzaru_geo"]), collection)
+    return models
+
+def read_order(job, suffix): # Sort key putting (source path, hash) jobs in file offset order
+    source_path, file_hash = job[:2]
+    return source_path, open_source(source_path).read_offset(suffix, file_hash)
+
+def file_stamp(source_path, suffix, file_hash): # Changes whenever the file (or the archive holding it) does
+    size, mtime = open_source(source_path).file_stamp(suffix, file_hash)
+    return f"{size}:{mtime}"
+
+def remove_model(collection): # Objects and collections of an imported model, its meshes and materials are purged later
+    objects = list(collection.all_objects)
+    armatures = [obj.data for obj in objects if obj.type == 'ARMATURE']
+    for obj in objects:
+        bpy.data.objects.remove(obj)
+    for armature in armatures:
+        if not armature.users:
+            bpy.data.armatures.remove(armature)
+    for child in collection.children_recursive:
+        bpy.data.collections.remove(child)
+    bpy.data.collections.remove(collection)
+
+def purge_unused(): # Tagged meshes, materials and images no model uses anymore
+    removed = 0
+    for datablocks, key in ((bpy.data.meshes, "sanzaru_mesh_key"), (bpy.data.materials, "sanzaru_material_hash"), (bpy.data.images, "sanzaru_texture_hash")):
+        for datablock in [datablock for datablock in datablocks if key in datablock and not datablock.users]:
+            datablocks.remove(datablock)
+            removed += 1
+    return removed
+
+def bind_weights(obj, submesh, bones):
+    group_names = []
+    for i in submesh.weight.pal.tolist():
+        group_names.append(bones[i].name)
+
+    vertex_group_refs = []
+    for group_name in group_names:
+        temp_group = obj.vertex_groups.new(name=group_name)
+        vertex_group_refs.append(temp_group)
+
+    for ref_i, weight, vertex_indices in submesh.weight_batches():
+        vertex_group_refs[ref_i].add(vertex_indices, weight / 255, 'REPLACE')
+
+class SanzaruModelBuilder: # Decode and build settings shared by the import operators
+    workers: IntProperty(
+        name="Worker Processes",
+        description="Processes used to decode files in parallel, 0 uses every core",
+        default=0,
+        min=0,
+    )
+    instance_meshes: BoolProperty(
+        name="Instance Identical Meshes",
+        description="Submeshes with identical geometry, weights and material share one mesh datablock, including meshes from earlier imports",
+        default=True,
+    )
+    use_texture_cache: BoolProperty(
+        name="Cache Textures",
+        description="Keep decoded textures on disk so later imports of the same files skip decoding",
+        default=True,
+    )
+    texture_cache_size: IntProperty(
+        name="Texture Cache Size (MB)",
+        description="Least recently used textures are removed from the cache past this size",
+        default=512,
+        min=1,
+    )
+    profile_path: StringProperty(
+        name="Profile Report",
+        description="Write per stage and per submesh timings to this JSON file, nothing is written when empty",
+        subtype='FILE_PATH',
+        default="",
+    )
+    use_cprofile: BoolProperty(
+        name="cProfile Capture",
+        description="Decode in the main process and capture a cProfile, printed to the console and saved next to the profile report",
+        default=False,
+    )
+    lod_mode: EnumProperty(
+        name="Detail Level",
+        description="Which GLOD detail levels to import",
+        items=(
+            ('HIGHEST', "Highest", "Only the first, most detailed level"),
+            ('LOWEST', "Lowest", "Only the last, cheapest level"),
+            ('ALL', "All", "Every level, lower levels are imported as hidden alternatives that can be swapped with Object > Show Sanzaru LOD"),
+            ('DISTANCE', "Camera Distance", "The level whose switch distance matches the distance from the scene camera to each model"),
+        ),
+        default='HIGHEST',
+    )
+    update_existing: BoolProperty(
+        name="Update Existing",
+        description="Skip models imported before whose files and settings are unchanged, rebuild changed ones in place and update changed materials and textures",
+        default=True,
+    )
+    lod_distance_scale: FloatProperty(
+        name="LOD Distance Scale",
+        description="Multiplies the camera distance before picking a level, larger values pick cheaper levels",
+        default=1.0,
+        min=0.0,
+    )
+    
+    def import_models(self, jobs, complete_sources=()):
+        return run_steps(self.import_steps(jobs, complete_sources))
+
+    def import_steps(self, jobs, complete_sources=()): # Yields between bounded units of work, see ImportSanzaruModel.modal
+        if not self.use_cprofile:
+            return (yield from self.import_body(jobs, complete_sources))
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return (yield from self.import_body(jobs, complete_sources))
+        finally: # Also reached on errors and cancels, so the profiler never keeps running
+            profiler.disable()
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+            if self.profile_path:
+                profiler.dump_stats(os.path.splitext(bpy.path.abspath(self.profile_path))[0] + ".prof")
+
+    def import_body(self, jobs, complete_sources):
+        # Earlier models from complete sources that are not in jobs are removed
+        start_time = time.perf_counter()
+        self.progress = 0.0
+        self.progress_label = "Checking for changes"
+        self.materials = {} # Material hash -> Blender material, shared by every model in this run
+        self.images = {} # Texture hash -> Blender image
+        self.material_stamps = {} # Material hash -> file stamps the material is tagged with
+        self.texture_stamps = {}
+        self.material_template = None # Node tree copied for every new material
+        self.pending_materials = [] # (mesh, material hash) of new meshes, assigned in one pass
+        self.aborted = False # Set when an undo or file load freed the datablocks being built
+        self.meshes = shared_meshes() if self.instance_meshes else {} # Mesh key -> Blender mesh, identical submeshes link to one datablock
+        self.built_count = 0
+        self.instanced_count = 0
+        self.instanced_vertices = 0
+        self.profile = Profile()
+        
+        camera = None
+        if self.lod_mode == 'DISTANCE':
+            camera_obj = bpy.context.scene.camera
+            if camera_obj is None:
+                self.report({'ERROR'}, "Camera distance detail level needs a scene camera")
+                return {'CANCELLED'}
+            x, y, z = camera_obj.matrix_world.translation
+            camera = (x, z, -y) # Blender Z up to model Y up
+        
+        # Only changed or new models are decoded, earlier models that changed are rebuilt
+        existing = imported_models() if self.update_existing else {}
+        decode_jobs = []
+        stamps = []
+        outdated = []
+        refresh_materials = {} # Material hash -> source, materials of unchanged models that are checked for changes
+        with self.profile.capture():
+            for i, job in enumerate(jobs):
+                self.progress = 0.05 * i / len(jobs)
+                yield
+                with profile_stage("change_check"):
+                    stamp = self.model_stamp(job, camera)
+                collection = existing.pop(tuple(job), None)
+                if collection is not None and collection.get("sanzaru_stamp") == stamp:
+                    for mat_hash in collection.get("sanzaru_materials", ()):
+                        refresh_materials.setdefault(mat_hash, job[0])
+                    continue
+                if collection is not None:
+                    outdated.append(collection)
+                decode_jobs.append(job + (self.lod_mode, camera, self.lod_distance_scale))
+                stamps.append(stamp)
+        stale = [collection for (source_path, geo_key), collection in existing.items() if source_path in complete_sources]
+        existing_materials = tagged(bpy.data.materials, "sanzaru_material_hash") if self.update_existing else {}
+        existing_images = tagged(bpy.data.images, "sanzaru_texture_hash") if self.update_existing else {}
+        
+        workers = self.workers
+        if self.use_cprofile: # Decode in this process so the capture covers every stage
+            workers = 1
+        
+        # Decode everything on worker processes first, datablocks are then created in one pass
+        try:
+            with self.profile.capture(), DecodePool(workers) as pool:
+                model_lods = yield from self.phase("Decoding models", 0.05, 0.5, pool.map_steps(decode_model, decode_jobs)) # Selected detail levels per .geo
+                models = [model for lods in model_lods for model in lods]
+            
+                material_sources = dict(refresh_materials)
+                for model in models:
+                    self.profile.merge(model.profile)
+                    for submesh in model.submeshes:
+                        material_sources.setdefault(submesh.material_hash, model.source_path)
+                material_jobs = {}
+                for mat_hash, source_path in material_sources.items(): # Unchanged materials from earlier imports are reused
+                    material = existing_materials.get(mat_hash)
+                    if material is not None:
+                        try:
+                            stamp = file_stamp(source_path, ".mat", mat_hash) + "|" + file_stamp(source_path, ".tex", material["sanzaru_texture_hash"])
+                        except (ValueError, OSError): # Old texture gone, the material now points elsewhere or is broken
+                            stamp = None
+                        if stamp is not None and material.get("sanzaru_stamp") == stamp:
+                            self.materials[mat_hash] = material
+                            continue
+                    material_jobs[mat_hash] = (source_path, mat_hash)
+                material_jobs = dict(sorted(material_jobs.items(), key=lambda item: read_order(item[1], ".mat")))
+                mats = yield from self.phase("Decoding materials", 0.5, 0.55, pool.map_steps(decode_material, list(material_jobs.values())))
+                self.decoded_materials = {mat.material_hash: mat for mat in mats}
+                self.refreshed_materials = [mat.material_hash for mat in mats if mat.material_hash in refresh_materials]
+            
+                texture_jobs = {}
+                for mat, (source_path, mat_hash) in zip(mats, material_jobs.values()):
+                    self.profile.merge(mat.profile)
+                    texture_stamp = file_stamp(source_path, ".tex", mat.texture_hash)
+                    self.material_stamps[mat_hash] = file_stamp(source_path, ".mat", mat_hash) + "|" + texture_stamp
+                    self.texture_stamps[mat.texture_hash] = texture_stamp
+                    image = existing_images.get(mat.texture_hash)
+                    if image is not None and image.get("sanzaru_stamp") == texture_stamp:
+                        self.images[mat.texture_hash] = image
+                        continue
+                    texture_jobs.setdefault(mat.texture_hash, (source_path, mat.texture_hash))
+                texture_jobs = dict(sorted(texture_jobs.items(), key=lambda item: read_order(item[1], ".tex")))
+                self.decoded_textures = {}
+                if self.use_texture_cache: # Cached textures are loaded here, only the rest go to the workers
+                    self.progress_label = "Loading cached textures"
+                    cache = TextureCache(limit=self.texture_cache_size * 1024 * 1024)
+                    for source_path, texture_hash in list(texture_jobs.values()):
+                        yield
+                        source = open_source(source_path)
+                        texture = cache.lookup(source.open(".tex", texture_hash), source.file_stamp(".tex", texture_hash))
+                        if texture is not None:
+                            self.decoded_textures[texture_hash] = texture
+                            del texture_jobs[texture_hash]
+                    texture_jobs = {texture_hash: job + (cache.folder,) for texture_hash, job in texture_jobs.items()}
+                textures = yield from self.phase("Decoding textures", 0.55, 0.7, pool.map_steps(decode_texture, list(texture_jobs.values())))
+                if self.use_texture_cache and textures:
+                    with profile_stage("texture_cache_evict"):
+                        cache.evict() # Once for the whole batch the workers stored
+                for texture in textures:
+                    self.profile.merge(texture.profile)
+                self.decoded_textures.update({texture.hash: texture for texture in textures})
+        finally: # Also reached when the import is cancelled
+            close_sources()
+        decode_time = time.perf_counter() - start_time
+        
+        vertex_count = 0
+        with self.profile.capture():
+            for collection in outdated + stale:
+                remove_model(collection)
+            self.old_images = existing_images # Changed textures are written into their old image
+            self.old_materials = existing_materials
+            self.progress_label = "Building models"
+            built = [] # (collection, stamp), stamped only once their materials are assigned
+            try:
+                for i, (lods, job, stamp) in enumerate(zip(model_lods, decode_jobs, stamps)):
+                    self.progress = 0.7 + 0.3 * i / len(model_lods)
+                    yield
+                    collection = self.build_model(lods)
+                    collection["sanzaru_source"] = job[0] # Folder or sancooked archive
+                    collection["sanzaru_geo"] = job[1] # .geo filename or archive entry index
+                    collection["sanzaru_materials"] = sorted({submesh.material_hash for model in lods for submesh in model.submeshes})
+                    built.append((collection, stamp))
+                    vertex_count += sum(model.vertex_count for model in lods)
+                self.progress_label = "Creating materials"
+                yield from self.material_steps()
+            except BaseException: # Cancelled or failed, models built so far still get their materials
+                if not self.aborted:
+                    run_steps(self.material_steps()) # Picks up where the interrupted pass stopped
+                raise
+            # A cancelled build leaves its models unstamped, so the next import rebuilds them
+            for collection, stamp in built:
+                collection["sanzaru_stamp"] = stamp
+            purged = purge_unused() if self.update_existing else 0
+        total_time = time.perf_counter() - start_time
+        
+        if self.profile_path:
+            path = bpy.path.abspath(self.profile_path)
+            self.profile.save(path, models=len(model_lods), lods=len(models), vertices=vertex_count, seconds=total_time, decode_seconds=decode_time)
+        
+        for line in self.profile.report_lines():
+            self.report({'INFO'}, line)
+        self.report({'INFO'}, f"Imported {len(model_lods)} models, {len(models)} detail levels ({vertex_count} vertices) in {total_time:.2f} s "
+                              f"(decode {decode_time:.2f} s), {len(model_lods) / max(total_time, 1e-6):.1f} models/s, "
+                              f"{total_time * 1000 / max(len(model_lods), 1):.1f} ms/model, "
+                              f"{self.instanced_count} of {self.built_count + self.instanced_count} submeshes instanced "
+                              f"({self.instanced_vertices} vertices)")
+        if self.update_existing:
+            self.report({'INFO'}, f"{len(jobs) - len(decode_jobs)} unchanged models skipped, {len(outdated)} updated, "
+                                  f"{len(stale)} removed, {len(self.refreshed_materials)} materials refreshed, {purged} unused datablocks purged")
+        return {'FINISHED'}
+
+    def phase(self, label, start, end, steps): # Runs pool steps, mapping their progress onto part of the import
+        self.progress_label = label
+        while True:
+            try:
+                fraction = next(steps)
+            except StopIteration as stop:
+                self.progress = end
+                return stop.value
+            self.progress = start + (end - start) * fraction
+            yield
+
+    def model_stamp(self, job, camera): # Changes with the .geo, the .mes files of the selected levels and the build settings
+        source_path, geo_key = job
+        source = open_source(source_path)
+        geo_data = source.read_geo(geo_key)
+        geo = SanzaruGEOB(geo_data)
+        lods = select_lods(geo, self.lod_mode, camera, self.lod_distance_scale)
+        stamp = hashlib.blake2b(geo_data, digest_size=16)
+        for lod in lods:
+            stamp.update(f"|{lod}:{file_stamp(source_path, '.mes', geo.lods[lod][0])}".encode())
+        stamp.update(f"|{self.instance_meshes}".encode())
+        return stamp.hexdigest()
+
+    def build_model(self, lods): # Detail levels of one .geo share its collection and skeleton
+        geo = lods[0].geo
+        collection = bpy.data.collections.new(geo.name)
+        bpy.context.scene.collection.children.link(collection)
+
+        if geo.bone_count:
+            with profile_stage("skeleton_build", bones=geo.bone_count):
+                skel_obj = make_skel(geo, collection)
+        else:
+            skel_obj = 0
+
+        for model in lods:
+            lod_collection = collection
+            if len(lods) > 1: # Each level gets a child collection, only the first one is shown
+                lod_collection = bpy.data.collections.new(f"{geo.name}_LOD{model.lod}")
+                lod_collection["sanzaru_lod"] = model.lod
+                lod_collection.hide_viewport = lod_collection.hide_render = model is not lods[0]
+                collection.children.link(lod_collection)
+            self.build_submeshes(model, lod_collection, skel_obj)
+            
+        if skel_obj:
+            skel_obj.rotation_euler = ((math.pi / 2),0,0)
+        return collection
+
+    def build_submeshes(self, model, collection, skel_obj):
+        geo = model.geo
+        # Create submeshes, reusing the mesh of an identical submesh when one was already built
+        for i, submesh in enumerate(model.submeshes):
+            submesh_start = time.perf_counter()
+            key = mesh_key(submesh, skel_obj)
+            me = self.meshes.get(key) if self.instance_meshes else None
+            if me is not None:
+                with profile_stage("mesh_instance"):
+                    mesh_obj = link_mesh(me, submesh_name(geo, i, model.lod), collection)
+                self.instanced_count += 1
+                self.instanced_vertices += submesh.vertex.count
+            else:
+                mesh_obj = make_mesh(submesh, geo, i, collection, skel_obj, model.lod)
+                self.pending_materials.append((mesh_obj.data, submesh.material_hash))
+                mesh_obj.data["sanzaru_mesh_key"] = key
+                self.meshes[key] = mesh_obj.data
+                self.built_count += 1
+            mesh_obj.scale *= submesh.vertex_scale
+            if skel_obj:
+                mesh_obj.parent = skel_obj
+                modifier = mesh_obj.modifiers.new("Armature", 'ARMATURE')
+                modifier.object = skel_obj
+            else:
+                mesh_obj.rotation_euler = ((math.pi / 2),0,0)
+            if model.profile:
+                model.profile.submeshes[i].update(build_seconds=time.perf_counter() - submesh_start, instanced=me is not None)
+
+    def material_steps(self): # Every material is created back to back, one per step, then each new mesh gets its single slot
+        for mat_hash in dict.fromkeys(mat_hash for me, mat_hash in self.pending_materials):
+            if mat_hash not in self.materials:
+                self.get_material(mat_hash)
+                yield
+        # Changed materials that no new mesh asked for, used by unchanged models or by reused instanced meshes,
+        # are updated in place as well
+        for mat_hash in self.decoded_materials:
+            if mat_hash in self.old_materials and mat_hash not in self.materials:
+                self.get_material(mat_hash)
+                yield
+        with profile_stage("material_assign", meshes=len(self.pending_materials)):
+            for me, mat_hash in self.pending_materials:
+                me.materials.append(self.materials[mat_hash])
+        self.pending_materials.clear()
+        if self.material_template is not None:
+            bpy.data.materials.remove(self.material_template)
+            self.material_template = None
+
+    def get_material(self, mat_hash): # Materials and textures are deduplicated by hash across all models
+        material = self.materials.get(mat_hash)
+        if material is not None:
+            return material
+        
+        with profile_stage("material_setup"):
+            return self.make_material(mat_hash)
+
+    def make_material(self, mat_hash):
+        mat = self.decoded_materials[mat_hash]
+        material = self.old_materials.get(mat_hash) # Changed materials are updated in place so every user sees the change
+        if material is None:
+            if self.material_template is None:
+                self.material_template = make_material_template()
+            material = self.material_template.copy()
+            material.name = mat.material_name # Blender may rename in case duplicates exist
+        material["sanzaru_material_hash"] = mat_hash
+        material["sanzaru_texture_hash"] = mat.texture_hash
+        material["sanzaru_stamp"] = self.material_stamps[mat_hash]
+        self.materials[mat_hash] = material
+        
+        # Find texture if not already created
+        texture = self.images.get(mat.texture_hash)
+        if texture is None:
+            decoded = self.decoded_textures[mat.texture_hash]
+            texture = self.old_images.get(mat.texture_hash)
+            if texture is None:
+                texture = make_image(decoded.name.split(".")[0], decoded)
+            else:
+                update_image(texture, decoded)
+            texture["sanzaru_texture_hash"] = mat.texture_hash
+            texture["sanzaru_stamp"] = self.texture_stamps[mat.texture_hash]
+            self.images[mat.texture_hash] = texture
+            
+        texture_node = material.node_tree.nodes.get(TEXTURE_NODE_NAME)
+        if texture_node is None: # Materials from imports made before the template existed
+            texture_node = next((node for node in material.node_tree.nodes if node.type == 'TEX_IMAGE'), None)
+        texture_node.image = texture
+        texture_node.extension = image_extension(mat.wrap_modes)
+        
+        # Viewport display colors from MTLH
+        material.diffuse_color = mat.diffuse_color
+        material.specular_color = mat.specular_color[:3]
+        return material
+
+def make_material_template(): # Principled BSDF with an image node on its base color
+    material = bpy.data.materials.new("SanzaruTemplate")
+    material.use_nodes = True
+    main_node = material.node_tree.nodes["Principled BSDF"]
+    texture_node = material.node_tree.nodes.new(type='ShaderNodeTexImage')
+    texture_node.name = TEXTURE_NODE_NAME
+    texture_node.location = (main_node.location.x - 300, main_node.location.y)
+    material.node_tree.links.new(texture_node.outputs['Color'], main_node.inputs['Base Color'])
+    return material
+
+def image_extension(wrap_modes): # Image nodes have one extension mode, the first axis that does not repeat decides
+    for mode in wrap_modes:
+        if mode != PICA_WRAP_REPEAT:
+            return WRAP_EXTENSIONS.get(mode, 'REPEAT')
+    return 'REPEAT'
+
+class ImportSanzaruModel(SanzaruModelBuilder, Operator, ImportHelper):
+    bl_idname = "custom_import_scene.sanzaru"
+    bl_label = "Import"
+    bl_options = {'REGISTER', 'UNDO'}
+    filename_ext = ".geo"
+    filter_glob: bpy.props.StringProperty(
+        default="*.geo;*.sancooked",
+        options={'HIDDEN'},
+        maxlen=255,
+    )
+    
+    filepath: StringProperty(subtype='FILE_PATH',)
+    directory: StringProperty(subtype='DIR_PATH', options={'HIDDEN'})
+    files: CollectionProperty(type=bpy.types.PropertyGroup)
+    import_folder: BoolProperty(
+        name="Whole Folder",
+        description="Import every .geo model in the selected folder instead of only the selected files",
+        default=False,
+    )
+    proxies_only: BoolProperty(
+        name="Bounding Box Proxies",
+        description="Only read the .geo headers and create a bounding box empty per model, load them later with Object > Load Sanzaru Proxies",
+        default=False,
+    )
+    name_filter: StringProperty(
+        name="Name Filter",
+        description="Only import models whose name matches this pattern (* and ? wildcards, not case sensitive), everything when empty",
+        default="",
+    )
+    background: BoolProperty(
+        name="Background Import",
+        description="Keep Blender responsive while importing, with progress in the status bar. Press Esc to cancel",
+        default=True,
+    )
+
+    def execute(self, context):
+        if self.proxies_only:
+            return self.import_proxies(self.model_jobs())
+        steps = self.import_steps(self.model_jobs(), self.complete_sources())
+        if not self.background or self.use_cprofile or bpy.app.background or context.window is None:
+            return run_steps(steps)
+        
+        # Work is done in time slices on timer events, datablocks are created on the main thread as usual
+        self.steps = steps
+        self.start_time = time.perf_counter()
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(IMPORT_TIME_SLICE, window=context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        running_imports.add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if self.aborted: # Stopped by stop_running_imports
+            return {'CANCELLED'}
+        if event.type == 'ESC':
+            self.steps.close() # Stops the workers and closes the sources
+            self.finish(context)
+            self.report({'WARNING'}, "Import cancelled, models built so far are kept")
+            return {'FINISHED'} # The kept models need an undo step like a finished import
+        if event.type == 'Z' and (event.ctrl or event.oskey): # Undo would free the datablocks being built
+            return {'RUNNING_MODAL'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        deadline = time.perf_counter() + IMPORT_TIME_SLICE
+        try:
+            while time.perf_counter() < deadline:
+                next(self.steps)
+        except StopIteration as stop:
+            self.finish(context)
+            return stop.value
+        except Exception:
+            self.steps.close()
+            self.finish(context)
+            raise
+        
+        elapsed = time.perf_counter() - self.start_time
+        status = f"Sanzaru import: {self.progress_label}, {self.progress * 100:.0f}%"
+        if self.progress > 0.01:
+            status += f", {elapsed * (1 - self.progress) / self.progress:.0f} s left"
+        context.workspace.status_text_set(status + " (Esc to cancel)")
+        context.window_manager.progress_update(int(self.progress * 100))
+        return {'PASS_THROUGH'}
+
+    def finish(self, context):
+        running_imports.discard(self)
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+    def abort(self): # The datablocks being built are about to be freed, stop without touching them again
+        self.aborted = True
+        self.steps.close()
+        self.finish(bpy.context)
+        self.report({'WARNING'}, "Import stopped by undo or file load")
+
+    def selected_paths(self):
+        directory = self.directory or os.path.dirname(os.path.abspath(self.filepath))
+        if self.import_folder:
+            return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.lower().endswith(".geo")]
+        names = [file.name for file in self.files if file.name]
+        if not names:
+            return [self.filepath]
+        return [os.path.join(directory, name) for name in names]
+
+    def complete_sources(self): # Sources imported as a whole, their models missing from this import are removed
+        if self.name_filter:
+            return []
+        sources = [os.path.abspath(path) for path in self.selected_paths() if not path.lower().endswith(".geo")]
+        if self.import_folder:
+            sources.append(os.path.abspath(self.directory or os.path.dirname(os.path.abspath(self.filepath))))
+        return sources
+
+    def model_jobs(self): # (source path, geo key) per model
+        jobs = []
+        for path in self.selected_paths():
+            path = os.path.abspath(path)
+            if path.lower().endswith(".geo"):
+                folder = os.path.dirname(path)
+                open_source(folder) # Build the folder index once here so workers only load it
+                jobs.append((folder, os.path.basename(path)))
+            else: # Sancooked archive, import every model without extracting
+                jobs.extend((path, key) for key in open_source(path).geo_keys())
+        if self.name_filter:
+            pattern = self.name_filter.lower()
+            jobs = [job for job in jobs if fnmatch.fnmatchcase(SanzaruGEOB(open_source(job[0]).read_geo(job[1])).name.lower(), pattern)]
+        return jobs
+
+    def import_proxies(self, jobs):
+        start_time = time.perf_counter()
+        collections = {}
+        for source_path, geo_key in jobs:
+            collection = collections.get(source_path)
+            if collection is None:
+                collection = bpy.data.collections.new(f"{os.path.basename(source_path)}_proxies")
+                bpy.context.scene.collection.children.link(collection)
+                collections[source_path] = collection
+            geo = SanzaruGEOB(open_source(source_path).read_geo(geo_key))
+            make_proxy(geo, source_path, geo_key, collection)
+        close_sources()
+        
+        self.report({'INFO'}, f"Created {len(jobs)} proxies in {time.perf_counter() - start_time:.2f} s")
+        return {'FINISHED'}
+
+class ImportSanzaruArchive(ImportSanzaruModel):
+    bl_idname = "custom_import_scene.sanzaru_archive"
+    bl_label = "Import Archive"
+    bl_options = {'REGISTER', 'UNDO'}
+    filename_ext = ".sancooked"
+    filter_glob: bpy.props.StringProperty(
+        default="*.sancooked",
+        options={'HIDDEN'},
+        maxlen=255,
+    )
+    import_folder: BoolProperty(options={'HIDDEN'}) # Archives are always imported whole
+
+    def selected_paths(self):
+        directory = self.directory or os.path.dirname(os.path.abspath(self.filepath))
+        names = [file.name for file in self.files if file.name.lower().endswith(".sancooked")]
+        if not names:
+            return [self.filepath]
+        return [os.path.join(directory, name) for name in names]
+
+class LoadSanzaruProxies(SanzaruModelBuilder, Operator):
+    bl_idname = "custom_import_scene.sanzaru_load_proxies"
+    bl_label = "Load Sanzaru Proxies"
+    bl_description = "Import the models behind the selected bounding box proxies and remove the proxies"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return any("sanzaru_source" in obj for obj in context.selected_objects)
+
+    def execute(self, context):
+        proxies = [obj for obj in context.selected_objects if "sanzaru_source" in obj]
+        jobs = [(obj["sanzaru_source"], obj["sanzaru_geo"]) for obj in proxies]
+        for source_path in {source_path for source_path, geo_key in jobs}:
+            open_source(source_path) # Build the folder index once here so workers only load it
+        result = self.import_models(jobs)
+        if 'FINISHED' in result: # A cancelled import keeps the proxies
+            for obj in proxies:
+                bpy.data.objects.remove(obj)
+        return result
+
+class ShowSanzaruLOD(Operator):
+    bl_idname = "custom_import_scene.sanzaru_show_lod"
+    bl_label = "Show Sanzaru LOD"
+    bl_description = "Show one detail level of the selected models imported with every LOD and hide the others"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    lod: IntProperty(
+        name="Level",
+        description="Detail level to show, models with fewer levels show their lowest one",
+        default=0,
+        min=0,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return bool(context.selected_objects)
+
+    def execute(self, context):
+        selected = set(context.selected_objects)
+        count = 0
+        for collection in bpy.data.collections:
+            lod_collections = [child for child in collection.children if "sanzaru_lod" in child]
+            if not lod_collections or selected.isdisjoint(collection.all_objects):
+                continue
+            lod = min(self.lod, max(child["sanzaru_lod"] for child in lod_collections))
+            for child in lod_collections:
+                child.hide_viewport = child.hide_render = child["sanzaru_lod"] != lod
+            count += 1
+        self.report({'INFO'}, f"Switched {count} models to LOD{self.lod}")
+        return {'FINISHED'}
+
+def make_proxy(geo, source_path, geo_key, collection): # Bounding box empty standing in for a model until it is loaded
+    bounds_min = mathutils.Vector(geo.bounds_min)
+    bounds_max = mathutils.Vector(geo.bounds_max)
+    obj = bpy.data.objects.new(geo.name, None)
+    obj.empty_display_type = 'CUBE'
+    obj.empty_display_size = 1.0
+    obj.rotation_euler = ((math.pi / 2),0,0) # Same Y up to Z up rotation as imported models
+    obj.location = obj.rotation_euler.to_matrix() @ ((bounds_min + bounds_max) / 2)
+    obj.scale = [max(size / 2, 0.001) for size in bounds_max - bounds_min]
+
+    # Enough to decode the model again later
+    obj["sanzaru_source"] = source_path # Folder or sancooked archive
+    obj["sanzaru_geo"] = geo_key # .geo filename or archive entry index
+    obj["sanzaru_mesh_hash"] = geo.hash # GLOD mesh hash
+    collection.objects.link(obj)
+    return obj
+
+def make_image(name, texture):
+    with profile_stage("image_create", pixels=texture.width * texture.height):
+        image = bpy.data.images.new(name, texture.width, texture.height, alpha=True)
+        image.pixels.foreach_set(texture.pixels.ravel())
+        image.pack() # Generated images are not saved with the .blend otherwise
+    return image
+
+def update_image(image, texture):
+    with profile_stage("image_create", pixels=texture.width * texture.height):
+        if tuple(image.size) != (texture.width, texture.height):
+            image.scale(texture.width, texture.height)
+        image.pixels.foreach_set(texture.pixels.ravel())
+        image.pack()
+
+def menu_func_import(self, context):
+    self.layout.operator(ImportSanzaruModel.bl_idname, text="Sonic Boom/Sanzaru Model (.geo)")
+    self.layout.operator(ImportSanzaruArchive.bl_idname, text="Sonic Boom/Sanzaru Archive (.sancooked)")
+
+running_imports = set() # Background imports in progress
+
+@persistent
+def stop_running_imports(*args): # Undo, redo and file loads free what a background import is building, Edit > Undo included
+    for operator in list(running_imports):
+        operator.abort()
+
+def menu_func_object(self, context):
+    self.layout.operator(LoadSanzaruProxies.bl_idname)
+    self.layout.operator(ShowSanzaruLOD.bl_idname)
+
+def register():
+    bpy.utils.register_class(ImportSanzaruModel)
+    bpy.utils.register_class(ImportSanzaruArchive)
+    bpy.utils.register_class(LoadSanzaruProxies)
+    bpy.utils.register_class(ShowSanzaruLOD)
+    bpy.types.TOPBAR_MT_file_import.append(menu_func_import)
+    bpy.types.VIEW3D_MT_object.append(menu_func_object)
+    for handlers in (bpy.app.handlers.undo_pre, bpy.app.handlers.redo_pre, bpy.app.handlers.load_pre):
+        handlers.append(stop_running_imports)
+
+def unregister():
+    bpy.utils.unregister_class(ImportSanzaruModel)
+    bpy.utils.unregister_class(ImportSanzaruArchive)
+    bpy.utils.unregister_class(LoadSanzaruProxies)
+    bpy.utils.unregister_class(ShowSanzaruLOD)
+    bpy.types.TOPBAR_MT_file_import.remove(menu_func_import)
+    bpy.types.VIEW3D_MT_object.remove(menu_func_object)
+    for handlers in (bpy.app.handlers.undo_pre, bpy.app.handlers.redo_pre, bpy.app.handlers.load_pre):
+        if stop_running_imports in handlers:
+            handlers.remove(stop_running_imports)